@@ -1,8 +1,9 @@
 import json
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from app.utils import verify_admin_user, verify_user_token
 from app.schemas.accounts import AccountResponse, UpdateAccountRequest, AdminAccountResponse, CreateAccountRequest
 from app.services.accounts import (
@@ -12,8 +13,11 @@ from app.services.accounts import (
     update_account_by_id_service,
     delete_account_service, 
 )
+from app.db.database import SessionLocal
 from app.db.session import get_db
+from app.pagination import decode_cursor, set_next_cursor
 from app.models.user import User
+from app.services.account_import import ImportJob, get_import_job, import_stream, list_import_jobs
 
 with open("app/docs/api_docs.json", "r", encoding="utf-8") as f:
     api_docs = json.load(f)
@@ -26,9 +30,9 @@ router = APIRouter()
             summary=api_docs["get_me"]["summary"],
             description=api_docs["get_me"]["description"])
 @router.get("/Me/", include_in_schema=False, response_model=AccountResponse, status_code=200)
-async def get_me(user: dict = Depends(verify_user_token), db: Session = Depends(get_db)):
+async def get_me(user: dict = Depends(verify_user_token), db: AsyncSession = Depends(get_db)):
     username = user.get("username") 
-    current_user = db.query(User).filter(User.username == username).first()  
+    current_user = await db.scalar(select(User).filter(User.username == username))  
 
     if not current_user:
         raise HTTPException(status_code=404, detail="Аккаунт не найден")
@@ -44,15 +48,15 @@ async def get_me(user: dict = Depends(verify_user_token), db: Session = Depends(
 async def update_account_route(
     request: UpdateAccountRequest,
     user: dict = Depends(verify_user_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     username = user.get("username") 
-    current_user = db.query(User).filter(User.username == username).first()  
+    current_user = await db.scalar(select(User).filter(User.username == username))  
 
     if not current_user:
         raise HTTPException(status_code=404, detail="Аккаунт не найден")
 
-    update_account_service(request, current_user, db)
+    await update_account_service(request, current_user, db)
     return JSONResponse(content={"message": "Аккаунт успешно обновлен"})
 
 
@@ -62,12 +66,16 @@ async def update_account_route(
             description=api_docs["get_accounts"]["description"])
 @router.get("", include_in_schema=False, response_model=List[AdminAccountResponse], status_code=200)
 async def get_accounts(
+    response: Response,
     from_: int = Query(0, ge=0, description="Начало выборки"),
     count: int = Query(10, ge=1, description="Размер выборки"),
+    after: Optional[str] = Query(None, description="Курсор следующей страницы (заголовок X-Next-Cursor)"),
     user: dict = Depends(verify_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    return get_accounts_service(from_, count, db)
+    accounts = await get_accounts_service(from_, count, db, after=decode_cursor(after))
+    set_next_cursor(response, accounts, count)
+    return accounts
 
 
 # Создать аккаунт (только для администраторов)
@@ -78,12 +86,46 @@ async def get_accounts(
 async def create_account(
     request: CreateAccountRequest,
     user: dict = Depends(verify_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    create_account_service(request, db)
+    await create_account_service(request, db)
     return JSONResponse(content={"message": "Аккаунт успешно создан"})
 
 
+# Импорт аккаунтов из NDJSON или CSV (только для администраторов)
+@router.post("/Import", status_code=202,
+             summary=api_docs["import_accounts"]["summary"],
+             description=api_docs["import_accounts"]["description"])
+@router.post("/Import/", include_in_schema=False, status_code=202)
+async def import_accounts(request: Request, user: dict = Depends(verify_admin_user)):
+    content_type = request.headers.get("content-type", "")
+    is_csv = "csv" in content_type
+    if not is_csv and "json" not in content_type:
+        raise HTTPException(status_code=415, detail="Поддерживаются только application/x-ndjson и text/csv")
+
+    job = ImportJob()
+    await import_stream(job, request.stream(), is_csv, SessionLocal)
+    return JSONResponse(status_code=202, content=job.to_dict())
+
+
+# Задачи импорта аккаунтов, в том числе ещё принимающие данные (только для администраторов)
+@router.get("/Import", status_code=200,
+            summary=api_docs["list_import_jobs"]["summary"],
+            description=api_docs["list_import_jobs"]["description"])
+@router.get("/Import/", include_in_schema=False, status_code=200)
+async def get_import_jobs(user: dict = Depends(verify_admin_user)):
+    return JSONResponse(content=[job.to_dict(include_errors=False) for job in list_import_jobs()])
+
+
+# Прогресс импорта аккаунтов (только для администраторов)
+@router.get("/Import/{job_id}", status_code=200,
+            summary=api_docs["get_import_job"]["summary"],
+            description=api_docs["get_import_job"]["description"])
+@router.get("/Import/{job_id}/", include_in_schema=False, status_code=200)
+async def get_import_progress(job_id: str, user: dict = Depends(verify_admin_user)):
+    return JSONResponse(content=get_import_job(job_id).to_dict())
+
+
 # Обновить аккаунт по ID (только для администраторов)
 @router.put("/{id}", status_code=200,
             summary=api_docs["update_account_by_id"]["summary"],
@@ -93,9 +135,9 @@ async def update_account_by_id(
     id: int,
     request: CreateAccountRequest,
     user: dict = Depends(verify_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    update_account_by_id_service(id, request, db)
+    await update_account_by_id_service(id, request, db)
     return JSONResponse(content={"message": "Аккаунт успешно обновлен"})
 
 
@@ -107,7 +149,7 @@ async def update_account_by_id(
 async def delete_account(
     id: int,
     user: dict = Depends(verify_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    delete_account_service(id, db)
+    await delete_account_service(id, db)
     return JSONResponse(content={"message": "Аккаунт успешно удален"})
\ No newline at end of file
@@ -1,12 +1,12 @@
-from datetime import datetime, timezone
 import json
 from fastapi import APIRouter, Depends, Response, Security
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from app.schemas.auth import RefreshTokenRequest, SignInRequest, TokenResponse, SignUpRequest
-from app.services.auth import sign_in_service, refresh_token_service, sign_out_service, validate_token_service, sign_up_service
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.auth import RefreshTokenRequest, SignInRequest, TokenResponse, SignUpRequest, ValidateBatchRequest
+from app.services.auth import sign_in_service, refresh_token_service, sign_out_service, validate_token_service, sign_up_service, validate_tokens_batch_service, token_info_response, sign_out_all_service
 from app.db.session import get_db
-from app.core.config import settings
+from app.core.keys import keyring
+from app.token_blacklist import is_blacklisted
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 with open("app/docs/api_docs.json", "r", encoding="utf-8") as f:
@@ -20,8 +20,8 @@ bearer_scheme = HTTPBearer()
              summary=api_docs["sign_up"]["summary"],
              description=api_docs["sign_up"]["description"])
 @router.post("/SignUp/", include_in_schema=False, status_code=200)
-async def sign_up(request: SignUpRequest, db: Session = Depends(get_db)):
-    sign_up_service(request, db)
+async def sign_up(request: SignUpRequest, db: AsyncSession = Depends(get_db)):
+    await sign_up_service(request, db)
     return JSONResponse(content={"message": "Аккаунт успешно создан"})
 
 # Войти
@@ -29,39 +29,65 @@ async def sign_up(request: SignUpRequest, db: Session = Depends(get_db)):
              summary=api_docs["sign_in"]["summary"],
              description=api_docs["sign_in"]["description"])
 @router.post("/SignIn/", include_in_schema=False, response_model=TokenResponse, status_code=200)
-async def sign_in(response: Response, request: SignInRequest, db: Session = Depends(get_db)):
-    return sign_in_service(request, response, db)
+async def sign_in(response: Response, request: SignInRequest, db: AsyncSession = Depends(get_db)):
+    return await sign_in_service(request, response, db)
 
 # Выйти
 @router.post("/SignOut", status_code=200,
              summary=api_docs["sign_out"]["summary"],
              description=api_docs["sign_out"]["description"])
 @router.post("/SignOut/", include_in_schema=False, status_code=200)
-async def sign_out(token: HTTPAuthorizationCredentials = Security(bearer_scheme), db: Session = Depends(get_db)):
+async def sign_out(token: HTTPAuthorizationCredentials = Security(bearer_scheme), db: AsyncSession = Depends(get_db)):
     access_token = token.credentials
-    sign_out_service(access_token, db)
+    await sign_out_service(access_token, db)
     return JSONResponse(content={"message": "Выход успешен"})
 
+# Выйти на всех устройствах
+@router.post("/SignOutAll", status_code=200,
+             summary=api_docs["sign_out_all"]["summary"],
+             description=api_docs["sign_out_all"]["description"])
+@router.post("/SignOutAll/", include_in_schema=False, status_code=200)
+async def sign_out_all(token: HTTPAuthorizationCredentials = Security(bearer_scheme), db: AsyncSession = Depends(get_db)):
+    await sign_out_all_service(token.credentials, db)
+    return JSONResponse(content={"message": "Выполнен выход на всех устройствах"})
+
 # Проверка Token (интроспекция токена)
 @router.get("/Validate", status_code=200,
             summary=api_docs["validate_token"]["summary"],
             description=api_docs["validate_token"]["description"])
 @router.get("/Validate/", include_in_schema=False, status_code=200)
-async def validate_token(accessToken: str, db: Session = Depends(get_db)):
-    token_info = validate_token_service(accessToken, db)
-    return JSONResponse(content={
-        "username": token_info.get("username"),
-        "user_id": token_info.get("user_id"),
-        "roles": token_info.get("roles", []),
-        "issued_at": datetime.fromtimestamp(token_info.get("iat", 0), tz=timezone.utc).isoformat() + "Z",
-        "expires_at": datetime.fromtimestamp(token_info.get("exp", 0), tz=timezone.utc).isoformat() + "Z",
-        "token_is_valid": True
-    })
+async def validate_token(accessToken: str, db: AsyncSession = Depends(get_db)):
+    token_info = await validate_token_service(accessToken, db)
+    return JSONResponse(content=token_info_response(token_info))
+
+# Пакетная проверка Token
+@router.post("/Validate/Batch", status_code=200,
+            summary=api_docs["validate_tokens_batch"]["summary"],
+            description=api_docs["validate_tokens_batch"]["description"])
+@router.post("/Validate/Batch/", include_in_schema=False, status_code=200)
+async def validate_tokens_batch(request: ValidateBatchRequest):
+    return JSONResponse(content=validate_tokens_batch_service(request.accessTokens))
+
+# Публичные ключи подписи токенов (JWKS)
+@router.get("/JWKS", status_code=200,
+            summary=api_docs["jwks"]["summary"],
+            description=api_docs["jwks"]["description"])
+@router.get("/JWKS/", include_in_schema=False, status_code=200)
+async def jwks():
+    return JSONResponse(content=keyring.jwks(), headers={"Cache-Control": "public, max-age=300"})
+
+# Проверка отзыва Token
+@router.get("/Revoked", status_code=200,
+            summary=api_docs["check_token_revoked"]["summary"],
+            description=api_docs["check_token_revoked"]["description"])
+@router.get("/Revoked/", include_in_schema=False, status_code=200)
+async def check_token_revoked(accessToken: str):
+    return JSONResponse(content={"revoked": is_blacklisted(accessToken)})
 
 # Обновить Token
 @router.post("/Refresh", response_model=TokenResponse, status_code=200,
              summary=api_docs["refresh_token"]["summary"],
              description=api_docs["refresh_token"]["description"])
 @router.post("/Refresh/", include_in_schema=False, response_model=TokenResponse, status_code=200)
-async def refresh_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
-    return await refresh_token_service(request.refreshToken)
\ No newline at end of file
+async def refresh_token(request: RefreshTokenRequest, db: AsyncSession = Depends(get_db)):
+    return await refresh_token_service(request.refreshToken, db)
\ No newline at end of file
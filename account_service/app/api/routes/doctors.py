@@ -1,11 +1,12 @@
 import json
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.utils import verify_user_token
 from app.db.session import get_db
-from app.schemas.doctors import DoctorResponse
-from app.services.doctors import get_doctors_service, get_doctor_by_id_service
+from app.pagination import decode_cursor, set_next_cursor
+from app.schemas.doctors import DoctorBatchResponse, DoctorResponse
+from app.services.doctors import get_doctors_service, get_doctor_by_id_service, get_doctors_by_ids_service
 
 with open("app/docs/api_docs.json", "r", encoding="utf-8") as f:
     api_docs = json.load(f)
@@ -18,15 +19,30 @@ router = APIRouter()
              description=api_docs["get_doctors"]["description"])
 @router.get("/Doctors/", include_in_schema=False, response_model=List[DoctorResponse], status_code=200)
 async def get_doctors(
+    response: Response,
     nameFilter: Optional[str] = Query(None, description="Фильтр имени"),
     from_: int = Query(0, ge=0, description="Начало выборки"),
     count: int = Query(10, ge=1, description="Размер выборки"),
-    db: Session = Depends(get_db),
+    after: Optional[str] = Query(None, description="Курсор следующей страницы (заголовок X-Next-Cursor)"),
+    db: AsyncSession = Depends(get_db),
     user: dict = Depends(verify_user_token)
 ):
-    doctors = get_doctors_service(db, name_filter=nameFilter, from_=from_, count=count)
+    doctors = await get_doctors_service(db, name_filter=nameFilter, from_=from_, count=count, after=decode_cursor(after))
+    set_next_cursor(response, doctors, count)
     return doctors
 
+# Получить докторов по списку ID (объявлен до /Doctors/{id})
+@router.get("/Doctors/Batch", response_model=DoctorBatchResponse, status_code=200,
+             summary=api_docs["get_doctors_by_ids"]["summary"],
+             description=api_docs["get_doctors_by_ids"]["description"])
+@router.get("/Doctors/Batch/", include_in_schema=False, response_model=DoctorBatchResponse, status_code=200)
+async def get_doctors_by_ids(
+    ids: List[int] = Query(..., min_length=1, max_length=100, description="ID докторов"),
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(verify_user_token),
+):
+    return await get_doctors_by_ids_service(db, doctor_ids=ids)
+
 # Получить доктора по ID
 @router.get("/Doctors/{id}", response_model=DoctorResponse, status_code=200,
              summary=api_docs["get_doctor_by_id"]["summary"],
@@ -34,8 +50,8 @@ async def get_doctors(
 @router.get("/Doctors/{id}/", include_in_schema=False, response_model=DoctorResponse, status_code=200)
 async def get_doctor_by_id(
     id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: dict = Depends(verify_user_token),
 ):
-    doctor = get_doctor_by_id_service(db, doctor_id=id)
+    doctor = await get_doctor_by_id_service(db, doctor_id=id)
     return doctor
\ No newline at end of file
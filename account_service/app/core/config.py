@@ -1,10 +1,26 @@
 import os
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str = os.getenv('DATABASE_URL')
-    SECRET_KEY: str = os.getenv('JWT_SECRET_KEY')
-    ALGORITHM: str = 'HS256'
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    MIGRATE_ON_STARTUP: bool = True
+    LOG_LEVEL: str = 'INFO'
+    SECRET_KEY: Optional[str] = os.getenv('JWT_SECRET_KEY')
+    ALGORITHM: str = os.getenv('JWT_ALGORITHM', 'HS256')
+    JWT_KEYS_DIR: Optional[str] = os.getenv('JWT_KEYS_DIR')
+    JWT_ACTIVE_KID: Optional[str] = os.getenv('JWT_ACTIVE_KID')
+    REVOCATION_SYNC_INTERVAL: float = 2.0
+    REVOCATION_SWEEP_INTERVAL: float = 600.0
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    REFRESH_SESSION_EXPIRE_DAYS: int = 30
+    PASSWORD_HASH_WORKERS: Optional[int] = None
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    ACCOUNT_IMPORT_BATCH_SIZE: int = 500
+    ACCOUNT_IMPORT_MAX_ROWS: int = 200000
+    ACCOUNT_IMPORT_QUEUE_BATCHES: int = 2
 
     
 
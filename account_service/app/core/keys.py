@@ -0,0 +1,96 @@
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+import rsa
+from jose import jwk
+from app.core.config import settings
+
+ASYMMETRIC_ALGORITHMS = ("RS256",)
+
+
+# Набор ключей подписи JWT. Каждый ключ - PEM-файл в JWT_KEYS_DIR, kid - имя файла.
+# Подписывает активный ключ (JWT_ACTIVE_KID или самый новый), в JWKS публикуются все,
+# чтобы токены, выпущенные до ротации, проверялись до истечения срока.
+class KeyRing:
+    def __init__(self, keys_dir: Optional[str], algorithm: str, active_kid: Optional[str] = None):
+        self.keys_dir = Path(keys_dir) if keys_dir else None
+        self.algorithm = algorithm
+        self.active_kid = active_kid
+        self._keys: Dict[str, jwk.Key] = {}
+        self._private_pems: Dict[str, str] = {}
+        self._loaded = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.algorithm in ASYMMETRIC_ALGORITHMS
+
+    def load(self):
+        self._keys.clear()
+        self._private_pems.clear()
+        if self.enabled:
+            if self.keys_dir is None or not self.keys_dir.is_dir():
+                raise RuntimeError(f"Для {self.algorithm} необходимо указать каталог ключей JWT_KEYS_DIR")
+
+            for path in sorted(self.keys_dir.glob("*.pem")):
+                pem = path.read_text()
+                self._private_pems[path.stem] = pem
+                self._keys[path.stem] = jwk.construct(pem, self.algorithm)
+
+            if not self._keys:
+                raise RuntimeError(f"В каталоге {self.keys_dir} нет ключей подписи JWT")
+            if self.active_kid is None:
+                self.active_kid = max(self._keys)
+            elif self.active_kid not in self._keys:
+                raise RuntimeError(f"Активный ключ JWT {self.active_kid} не найден")
+        self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    # Ключ и заголовки для подписи нового токена
+    def signing_key(self) -> tuple:
+        self._ensure_loaded()
+        if not self.enabled:
+            return settings.SECRET_KEY, None
+        return self._private_pems[self.active_kid], {"kid": self.active_kid}
+
+    # Ключ для проверки подписи токена с указанным kid
+    def verification_key(self, kid: Optional[str]):
+        self._ensure_loaded()
+        if not self.enabled:
+            return settings.SECRET_KEY
+        key = self._keys.get(kid)
+        return key.public_key().to_dict() if key else None
+
+    def jwks(self) -> dict:
+        self._ensure_loaded()
+        keys = []
+        for kid, key in self._keys.items():
+            public_jwk = key.public_key().to_dict()
+            public_jwk.update({"kid": kid, "use": "sig"})
+            keys.append(public_jwk)
+        return {"keys": keys}
+
+
+# Сгенерировать новый ключ. Имя файла - время создания, поэтому новый ключ становится активным
+def generate_key(keys_dir: str, bits: int = 2048) -> Path:
+    directory = Path(keys_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    kid = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    _, private_key = rsa.newkeys(bits)
+    path = directory / f"{kid}.pem"
+    path.write_bytes(private_key.save_pkcs1())
+    path.chmod(0o600)
+    return path
+
+
+keyring = KeyRing(settings.JWT_KEYS_DIR, settings.ALGORITHM, settings.JWT_ACTIVE_KID)
+
+
+# Ротация ключей: python -m app.core.keys rotate
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rotate"] or not settings.JWT_KEYS_DIR:
+        sys.exit("Использование: JWT_KEYS_DIR=<каталог> python -m app.core.keys rotate")
+    print(f"Создан ключ {generate_key(settings.JWT_KEYS_DIR)}")
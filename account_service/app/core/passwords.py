@@ -0,0 +1,136 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from app.core.config import settings
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# Выполняются в процессе пула. Возвращают результат, время ожидания в очереди и время хэширования
+def _hash(password: str, submitted_at: float) -> tuple:
+    started_at = time.time()
+    result = pwd_context.hash(password)
+    return result, started_at - submitted_at, time.time() - started_at
+
+
+def _verify(password: str, hashed_password: str, submitted_at: float) -> tuple:
+    started_at = time.time()
+    result = pwd_context.verify(password, hashed_password)
+    return result, started_at - submitted_at, time.time() - started_at
+
+
+# Накопленная статистика длительностей (секунды)
+class Timing:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        seconds = max(seconds, 0.0)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def stats(self) -> dict:
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 4) if self.count else 0.0,
+            "max": round(self.max, 4),
+        }
+
+
+# bcrypt занимает ~250 мс CPU, поэтому хэширование и проверка паролей выполняются
+# в пуле процессов, а не в цикле событий. Если в очереди больше PASSWORD_HASH_MAX_PENDING
+# задач, новые запросы сразу получают 503 вместо бесконечного ожидания.
+class PasswordHasher:
+    def __init__(self, workers: Optional[int], max_pending: int):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+        self.rejected = 0
+        self.queue_wait = Timing()
+        self.hash_time = Timing()
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Сервис перегружен, повторите попытку позже",
+                headers={"Retry-After": "1"},
+            )
+        return await self._submit(fn, *args)
+
+    async def _submit(self, fn, *args):
+        self.start()
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, queue_wait, hash_time = await loop.run_in_executor(self._executor, fn, *args, time.time())
+        finally:
+            self.pending -= 1
+
+        self.queue_wait.observe(queue_wait)
+        self.hash_time.observe(hash_time)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, password, hashed_password)
+
+    # Массовое хэширование (импорт): не более workers задач в очереди одновременно,
+    # чтобы интерактивные входы не упирались в лимит PASSWORD_HASH_MAX_PENDING
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def hash_one(password: str) -> str:
+            async with semaphore:
+                return await self._submit(_hash, password)
+
+        return await asyncio.gather(*(hash_one(password) for password in passwords))
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            "queue_wait_seconds": self.queue_wait.stats(),
+            "hash_seconds": self.hash_time.stats(),
+        }
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
+
+
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(password, hashed_password)
+
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    return await password_hasher.hash_many(passwords)
@@ -0,0 +1,38 @@
+import logging
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+logger = logging.getLogger(__name__)
+
+# Условие частичных индексов по докторам. Запросы должны содержать его буквально
+# (без параметров), иначе планировщик не сможет использовать частичный индекс.
+ACTIVE_DOCTOR_PREDICATE = "users.is_active AND 'Doctor' = ANY(users.roles)"
+
+DOCTOR_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_users_active_doctors ON users (id) "
+    "WHERE is_active AND 'Doctor' = ANY(roles)",
+]
+
+DOCTOR_TRGM_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_users_doctor_first_name_trgm ON users "
+    "USING gin (\"firstName\" gin_trgm_ops) WHERE is_active AND 'Doctor' = ANY(roles)",
+    "CREATE INDEX IF NOT EXISTS ix_users_doctor_last_name_trgm ON users "
+    "USING gin (\"lastName\" gin_trgm_ops) WHERE is_active AND 'Doctor' = ANY(roles)",
+]
+
+
+# Индексы для поиска докторов. Триграммные индексы (ILIKE '%имя%') создаются,
+# только если на сервере доступно расширение pg_trgm; без него поиск работает,
+# но последовательным сканированием по частичному индексу докторов.
+async def create_search_indexes(conn: AsyncConnection):
+    for statement in DOCTOR_INDEXES:
+        await conn.execute(text(statement))
+
+    available = await conn.scalar(text("SELECT count(*) FROM pg_available_extensions WHERE name = 'pg_trgm'"))
+    if not available:
+        logger.warning("Расширение pg_trgm недоступно, триграммные индексы поиска докторов не созданы")
+        return
+
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for statement in DOCTOR_TRGM_INDEXES:
+        await conn.execute(text(statement))
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import sys
+from typing import Awaitable, Callable, List, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from app.db.indexes import create_search_indexes
+
+logger = logging.getLogger(__name__)
+
+# Ключ pg_advisory_xact_lock: миграции применяет только один процесс, остальные ждут
+MIGRATIONS_LOCK_KEY = 72310001
+
+# Таблица применённых миграций - своя у каждого сервиса: в docker-compose все сервисы
+# работают в одной БД, и общая schema_migrations смешивала бы их номера версий.
+# Миграции идемпотентны, поэтому при переходе со старой общей таблицы они просто
+# применяются повторно.
+MIGRATIONS_TABLE = "account_schema_migrations"
+
+Migration = Tuple[int, str, Callable[[AsyncConnection], Awaitable[None]]]
+
+
+async def _execute(conn: AsyncConnection, *statements: str):
+    for statement in statements:
+        await conn.execute(text(statement))
+
+
+# 1. Исходная схема (совпадает с тем, что создавал create_all, поэтому безопасна для существующих БД)
+async def initial_schema(conn: AsyncConnection):
+    await _execute(
+        conn,
+        """CREATE TABLE IF NOT EXISTS users (
+            id SERIAL NOT NULL PRIMARY KEY,
+            "firstName" VARCHAR,
+            "lastName" VARCHAR,
+            username VARCHAR,
+            password VARCHAR,
+            is_active BOOLEAN,
+            roles VARCHAR[] NOT NULL
+        )""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_username ON users (username)",
+        "CREATE INDEX IF NOT EXISTS ix_users_id ON users (id)",
+        'CREATE INDEX IF NOT EXISTS "ix_users_firstName" ON users ("firstName")',
+        'CREATE INDEX IF NOT EXISTS "ix_users_lastName" ON users ("lastName")',
+        """CREATE TABLE IF NOT EXISTS revoked_tokens (
+            token_id VARCHAR(64) NOT NULL PRIMARY KEY,
+            expiration TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            revoked_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_revoked_tokens_expiration ON revoked_tokens (expiration)",
+        "CREATE INDEX IF NOT EXISTS ix_revoked_tokens_revoked_at ON revoked_tokens (revoked_at)",
+    )
+
+
+# 2. Старая таблица с JWT целиком заменена revoked_tokens. Ещё не истёкшие отзывы
+# переносятся (у старых токенов нет jti, идентификатор - SHA-256 токена), иначе
+# токены, с которыми вышли до обновления, снова стали бы действительны
+async def drop_legacy_blacklist(conn: AsyncConnection):
+    if await conn.scalar(text("""SELECT to_regclass('"Blacklisted_Tokens"')""")) is None:
+        return
+    await _execute(
+        conn,
+        """INSERT INTO revoked_tokens (token_id, expiration, revoked_at)
+            SELECT encode(sha256(convert_to(token, 'UTF8')), 'hex'), expiration, now() AT TIME ZONE 'utc'
+            FROM "Blacklisted_Tokens"
+            WHERE expiration > now() AT TIME ZONE 'utc'
+            ON CONFLICT (token_id) DO NOTHING""",
+        'DROP TABLE "Blacklisted_Tokens"',
+    )
+
+
+# 4. Сессии refresh-токенов и отметка "токены до этого момента недействительны"
+async def refresh_sessions(conn: AsyncConnection):
+    await _execute(
+        conn,
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS tokens_valid_after TIMESTAMP WITHOUT TIME ZONE",
+        "CREATE INDEX IF NOT EXISTS ix_users_tokens_valid_after ON users (tokens_valid_after) "
+        "WHERE tokens_valid_after IS NOT NULL",
+        """CREATE TABLE IF NOT EXISTS refresh_sessions (
+            id VARCHAR(32) NOT NULL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            current_jti VARCHAR(32) NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            rotated_at TIMESTAMP WITHOUT TIME ZONE,
+            expires_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            revoked_at TIMESTAMP WITHOUT TIME ZONE
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_refresh_sessions_expires_at ON refresh_sessions (expires_at)",
+        "CREATE INDEX IF NOT EXISTS ix_refresh_sessions_active_user_id ON refresh_sessions (user_id) "
+        "WHERE revoked_at IS NULL",
+    )
+
+
+MIGRATIONS: List[Migration] = [
+    (1, "initial_schema", initial_schema),
+    (2, "drop_legacy_blacklist", drop_legacy_blacklist),
+    (3, "doctor_search_indexes", create_search_indexes),
+    (4, "refresh_sessions", refresh_sessions),
+]
+
+
+# Применить недостающие миграции в одной транзакции. Возвращает номера применённых
+async def run_migrations(engine: AsyncEngine) -> List[int]:
+    applied_now = []
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+        await _execute(
+            conn,
+            f"""CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR NOT NULL,
+                applied_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+            )""",
+        )
+        applied = set(await conn.scalars(text(f"SELECT version FROM {MIGRATIONS_TABLE}")))
+
+        for version, name, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            logger.info("Применение миграции %s_%s", version, name)
+            await migrate(conn)
+            await conn.execute(
+                text(f"INSERT INTO {MIGRATIONS_TABLE} (version, name) VALUES (:version, :name)"),
+                {"version": version, "name": name},
+            )
+            applied_now.append(version)
+    return applied_now
+
+
+# Применение миграций вне запуска сервиса: python -m app.db.migrations
+if __name__ == "__main__":
+    from app.db.database import engine
+
+    async def main():
+        applied = await run_migrations(engine)
+        await engine.dispose()
+        print(f"Применены миграции: {applied}" if applied else "Схема БД актуальна")
+
+    if sys.argv[1:]:
+        sys.exit("Использование: python -m app.db.migrations")
+    asyncio.run(main())
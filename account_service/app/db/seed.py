@@ -0,0 +1,42 @@
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.core.passwords import hash_passwords
+from app.models.user import User
+
+default_accounts = [
+    {"lastName": "Admin", "firstName": "Admin", "username": "admin", "password": "admin", "roles": ["Admin"]},
+    {"lastName": "Manager", "firstName": "Manager", "username": "manager", "password": "manager", "roles": ["Manager"]},
+    {"lastName": "Doctor", "firstName": "Doctor", "username": "doctor", "password": "doctor", "roles": ["Doctor"]},
+    {"lastName": "User", "firstName": "User", "username": "user", "password": "user", "roles": ["User"]},
+]
+
+
+# Ключ pg_advisory_xact_lock: при запуске нескольких воркеров аккаунты создаёт первый,
+# остальные дожидаются его и находят аккаунты уже созданными
+SEED_LOCK_KEY = 72310002
+
+
+# Создать недостающие аккаунты по умолчанию. Пароли хэшируются параллельно и только
+# для отсутствующих аккаунтов.
+async def seed_default_accounts(session_factory: async_sessionmaker) -> int:
+    async with session_factory() as db:
+        await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SEED_LOCK_KEY})
+        existing = set(await db.scalars(
+            select(User.username).filter(User.username.in_([account["username"] for account in default_accounts]))
+        ))
+        missing = [account for account in default_accounts if account["username"] not in existing]
+        if not missing:
+            await db.commit()
+            return 0
+
+        hashed = await hash_passwords([account["password"] for account in missing])
+        created = await db.scalars(
+            insert(User)
+            .values([{**account, "password": password, "is_active": True} for account, password in zip(missing, hashed)])
+            .on_conflict_do_nothing(index_elements=[User.username])
+            .returning(User.id)
+        )
+        count = len(created.all())
+        await db.commit()
+    return count
@@ -0,0 +1,14 @@
+from datetime import timezone
+from sqlalchemy import DateTime
+from sqlalchemy.types import TypeDecorator
+
+# Время хранится в БД без часового пояса (UTC). asyncpg, в отличие от psycopg2,
+# не принимает aware datetime для таких столбцов, поэтому приводим его к наивному UTC.
+class UTCDateTime(TypeDecorator):
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
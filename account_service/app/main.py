@@ -1,12 +1,58 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
 from fastapi import FastAPI
-from sqlalchemy.orm import Session
 from app.api.routes import auth, accounts, doctors
-from app.db.database import Base, engine
-from app.db.session import get_db
-from app.models.user import User
-from passlib.context import CryptContext
+from app.core.config import settings
+from app.core.keys import keyring
+from app.core.passwords import password_hasher
+from app.db.database import SessionLocal, engine
+from app.db.migrations import run_migrations
+from app.db.seed import seed_default_accounts
+from app.token_blacklist import revocation_store, run_revocation_maintenance
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+# Время каждого этапа запуска пишется в лог
+@contextmanager
+def startup_phase(name: str):
+    started = time.perf_counter()
+    yield
+    logger.info("Запуск: %s - %.3f с", name, time.perf_counter() - started)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    with startup_phase("ключи подписи"):
+        keyring.load()
+        password_hasher.start()
+
+    if settings.MIGRATE_ON_STARTUP:
+        with startup_phase("миграции"):
+            applied = await run_migrations(engine)
+            if applied:
+                logger.info("Применены миграции: %s", applied)
+
+    with startup_phase("аккаунты по умолчанию"):
+        seeded = await seed_default_accounts(SessionLocal)
+        if seeded:
+            logger.info("Созданы аккаунты по умолчанию: %s", seeded)
+
+    with startup_phase("отозванные токены"):
+        async with SessionLocal() as db:
+            await revocation_store.load(db)
+
+    maintenance = asyncio.create_task(run_revocation_maintenance(SessionLocal))
+    logger.info("Запуск завершён за %.3f с", time.perf_counter() - started)
+
+    yield  
+
+    maintenance.cancel()
+    password_hasher.close()
+    await engine.dispose()
 
 app = FastAPI(
     title="МИКРОСЕРВИС АККАУНТОВ",
@@ -14,12 +60,9 @@ app = FastAPI(
                     пользователях. Все остальные сервисы зависят от него, ведь
                     именно он выпускает JWT токен и проводит интроспекцию.""",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-Base.metadata.create_all(bind=engine)
-
 app.include_router(auth.router, prefix="/api/Authentication", tags=["Authentication"])
 app.include_router(accounts.router, prefix="/api/Accounts", tags=["Accounts"])
 app.include_router(doctors.router, prefix="/api", tags=["Doctors"])
@@ -32,34 +75,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-default_accounts = [
-    {"lastName": "Admin", "firstName": "Admin", "username": "admin", "password": "admin", "roles": ["Admin"]},
-    {"lastName": "Manager", "firstName": "Manager", "username": "manager", "password": "manager", "roles": ["Manager"]},
-    {"lastName": "Doctor", "firstName": "Doctor", "username": "doctor", "password": "doctor", "roles": ["Doctor"]},
-    {"lastName": "User", "firstName": "User", "username": "user", "password": "user", "roles": ["User"]},
-]
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    db: Session = next(get_db())
-    for account in default_accounts:
-        existing_user = db.query(User).filter(User.username == account["username"]).first()
-        if existing_user is None:
-            hashed_password = pwd_context.hash(account["password"])
-            user = User(
-                lastName=account["lastName"],
-                firstName=account["firstName"],
-                username=account["username"],
-                password=hashed_password,
-                roles=account["roles"],
-            )
-            db.add(user)
-    db.commit()
-    db.close()
-
-    yield  
-
 @app.get("/")
 def read_root():
     return {"message": "Account Service"}
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return {
+        "revocations": revocation_store.stats(),
+        "password_hasher": password_hasher.stats(),
+    }
+
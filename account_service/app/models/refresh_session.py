@@ -0,0 +1,20 @@
+from sqlalchemy import Column, ForeignKey, Index, Integer, String
+from app.db.database import Base
+from app.db.types import UTCDateTime
+
+# Сессия refresh-токена: действителен только токен с current_jti,
+# предъявление предыдущего токена сессии считается кражей и отзывает её
+class RefreshSession(Base):
+    __tablename__ = "refresh_sessions"
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    current_jti = Column(String(32), nullable=False)
+    created_at = Column(UTCDateTime, nullable=False)
+    rotated_at = Column(UTCDateTime, nullable=True)
+    expires_at = Column(UTCDateTime, nullable=False, index=True)
+    revoked_at = Column(UTCDateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_refresh_sessions_active_user_id", "user_id", postgresql_where=revoked_at.is_(None)),
+    )
@@ -1,9 +1,11 @@
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String
 from app.db.database import Base
+from app.db.types import UTCDateTime
 
+# Отозванные токены: хранится jti (или SHA-256 токена), а не сам JWT
 class Blacklist(Base):
-    __tablename__ = "Blacklisted_Tokens"
-
-    token = Column(String, primary_key=True, index=True)
-    expiration = Column(DateTime)
+    __tablename__ = "revoked_tokens"
 
+    token_id = Column(String(64), primary_key=True)
+    expiration = Column(UTCDateTime, nullable=False, index=True)
+    revoked_at = Column(UTCDateTime, nullable=False, index=True)
@@ -1,6 +1,7 @@
 from sqlalchemy import Column, Integer, String, Boolean, ARRAY
 from sqlalchemy.dialects.postgresql import ARRAY
 from app.db.database import Base
+from app.db.types import UTCDateTime
 
 class User(Base):
     __tablename__ = "users"
@@ -12,6 +13,8 @@ class User(Base):
     password = Column(String)
     is_active = Column(Boolean, default=True)
     roles = Column(ARRAY(String), nullable=False, default=["User"])  
+    # Токены, выпущенные до этого момента, недействительны ("выйти на всех устройствах")
+    tokens_valid_after = Column(UTCDateTime, nullable=True)
 
     def __repr__(self):
         return f"<User(id={self.id}, username={self.username}, roles={self.roles})>"
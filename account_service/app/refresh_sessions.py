@@ -0,0 +1,78 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.refresh_session import RefreshSession
+from app.models.user import User
+from app.token_blacklist import revocation_store, utcnow
+
+
+def new_token_id() -> str:
+    return uuid.uuid4().hex
+
+
+# Новая сессия при входе. Возвращает сессию; jti refresh-токена - session.current_jti
+async def create_session(user_id: int, db: AsyncSession) -> RefreshSession:
+    now = utcnow()
+    session = RefreshSession(
+        id=new_token_id(),
+        user_id=user_id,
+        current_jti=new_token_id(),
+        created_at=now,
+        expires_at=now + timedelta(days=settings.REFRESH_SESSION_EXPIRE_DAYS),
+    )
+    db.add(session)
+    return session
+
+
+# Ротация: действителен только последний выданный refresh-токен сессии.
+# Предъявление старого токена означает, что он утёк, поэтому сессия отзывается целиком.
+async def rotate_session(session_id: Optional[str], jti: Optional[str], db: AsyncSession) -> RefreshSession:
+    if not session_id or not jti:
+        raise HTTPException(status_code=401, detail="Неверный refresh_token")
+
+    session = await db.scalar(
+        select(RefreshSession).filter(RefreshSession.id == session_id).with_for_update()
+    )
+    if session is None or session.revoked_at is not None or session.expires_at <= utcnow():
+        raise HTTPException(status_code=401, detail="Сессия завершена, войдите снова")
+
+    if session.current_jti != jti:
+        session.revoked_at = utcnow()
+        await db.commit()
+        raise HTTPException(status_code=401, detail="Повторное использование refresh_token, сессия отозвана")
+
+    session.current_jti = new_token_id()
+    session.rotated_at = utcnow()
+    return session
+
+
+# Завершить одну сессию (выход на текущем устройстве)
+async def revoke_session(session_id: Optional[str], db: AsyncSession):
+    if session_id:
+        await db.execute(
+            update(RefreshSession)
+            .filter(RefreshSession.id == session_id, RefreshSession.revoked_at.is_(None))
+            .values(revoked_at=utcnow())
+        )
+
+
+# Выйти на всех устройствах: все сессии пользователя завершаются, а access-токены,
+# выпущенные до этого момента, отклоняются по отметке users.tokens_valid_after
+async def revoke_user_tokens(user_id: int, db: AsyncSession):
+    now = utcnow()
+    await db.execute(update(User).filter(User.id == user_id).values(tokens_valid_after=now))
+    await db.execute(
+        update(RefreshSession)
+        .filter(RefreshSession.user_id == user_id, RefreshSession.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+    await db.commit()
+    revocation_store.set_valid_after(user_id, now)
+
+
+def session_expiration(session: RefreshSession) -> timedelta:
+    return session.expires_at.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)
@@ -29,6 +29,9 @@ class CreateAccountRequest(BaseModel):
     password: str
     roles: List[str]
 
+class ImportAccountRow(CreateAccountRequest):
+    roles: List[str] = ["User"]
+
 class DeleteResponse(BaseModel):
     detail: str
     
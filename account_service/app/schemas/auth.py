@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List
 
 class SignUpRequest(BaseModel):
@@ -25,6 +25,9 @@ class SignInRequest(BaseModel):
 class RefreshTokenRequest(BaseModel):
     refreshToken: str
 
+class ValidateBatchRequest(BaseModel):
+    accessTokens: List[str] = Field(..., min_length=1, max_length=1000)
+
 class TokenResponse(BaseModel):
     access_token: str
     refresh_token: str
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List
 
 class DoctorResponse(BaseModel):
     firstName: str
@@ -6,3 +7,11 @@ class DoctorResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class DoctorBatchItem(DoctorResponse):
+    id: int
+
+class DoctorBatchResponse(BaseModel):
+    doctors: List[DoctorBatchItem]
+    missing: List[int]
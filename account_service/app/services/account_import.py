@@ -0,0 +1,249 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.core.config import settings
+from app.core.passwords import hash_passwords
+from app.models.user import User
+from app.schemas.accounts import ImportAccountRow
+
+logger = logging.getLogger(__name__)
+
+# Сколько ошибок строк хранится в задаче (счётчик failed учитывает все)
+MAX_REPORTED_ERRORS = 1000
+# Сколько завершённых задач хранится для запроса прогресса
+MAX_FINISHED_JOBS = 100
+
+
+# Задача импорта аккаунтов и её прогресс
+class ImportJob:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "receiving"
+        self.total = 0
+        self.processed = 0
+        self.created = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def add_error(self, row: int, detail: str, username: Optional[str] = None):
+        self.failed += 1
+        self.processed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "username": username, "detail": detail})
+
+    def finish(self, status: str):
+        self.status = status
+        self.finished_at = time.time()
+
+    def to_dict(self, include_errors: bool = True) -> dict:
+        result = {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "created": self.created,
+            "failed": self.failed,
+            "elapsed_seconds": round((self.finished_at or time.time()) - self.started_at, 3),
+        }
+        if include_errors:
+            result["errors"] = self.errors
+        return result
+
+
+# Задачи импорта в памяти процесса
+import_jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+
+
+def register_job(job: ImportJob):
+    import_jobs[job.id] = job
+    finished = [job_id for job_id, j in import_jobs.items() if j.finished_at is not None]
+    for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+        del import_jobs[job_id]
+
+
+def get_import_job(job_id: str) -> ImportJob:
+    job = import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача импорта не найдена")
+    return job
+
+
+# Разбить поток байтов на строки, не загружая тело запроса целиком
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8-sig").rstrip("\r")
+
+
+def parse_ndjson(line: str) -> dict:
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("ожидался JSON-объект")
+    return record
+
+
+# CSV: первая строка - заголовок, роли перечисляются через ";"
+def parse_csv(line: str, header: List[str]) -> dict:
+    values = next(csv.reader(io.StringIO(line)))
+    if len(values) != len(header):
+        raise ValueError(f"ожидалось {len(header)} столбцов, получено {len(values)}")
+    record = dict(zip(header, values))
+    if "roles" in record:
+        roles = [role.strip() for role in record["roles"].split(";") if role.strip()]
+        if roles:
+            record["roles"] = roles
+        else:
+            del record["roles"]
+    return record
+
+
+# Приём тела запроса: каждая строка проверяется сразу, ошибки фиксируются построчно,
+# корректные строки передаются в очередь пачками по ACCOUNT_IMPORT_BATCH_SIZE.
+# Очередь ограничена: если БД и хэширование не успевают, чтение тела приостанавливается
+async def receive_rows(job: ImportJob, stream: AsyncIterator[bytes], is_csv: bool, queue: asyncio.Queue):
+    header: Optional[List[str]] = None
+    usernames = set()
+    row_number = 0
+    batch: List[Tuple[int, ImportAccountRow]] = []
+
+    async for line in iter_lines(stream):
+        if job.finished_at is not None:
+            return
+        if not line.strip():
+            continue
+        if is_csv and header is None:
+            header = [column.strip() for column in next(csv.reader(io.StringIO(line)))]
+            continue
+
+        row_number += 1
+        if row_number > settings.ACCOUNT_IMPORT_MAX_ROWS:
+            raise HTTPException(status_code=413, detail=f"Не более {settings.ACCOUNT_IMPORT_MAX_ROWS} строк за один импорт")
+
+        job.total += 1
+        try:
+            record = parse_csv(line, header) if is_csv else parse_ndjson(line)
+            row = ImportAccountRow(**record)
+        except (ValueError, TypeError, csv.Error) as e:
+            detail = "; ".join(err["msg"] for err in e.errors()) if isinstance(e, ValidationError) else str(e)
+            job.add_error(row_number, f"Некорректная строка: {detail}")
+            continue
+
+        if row.username in usernames:
+            job.add_error(row_number, "Имя пользователя повторяется в файле", row.username)
+            continue
+        usernames.add(row.username)
+        batch.append((row_number, row))
+        if len(batch) >= settings.ACCOUNT_IMPORT_BATCH_SIZE:
+            await queue.put(batch)
+            batch = []
+
+    if batch:
+        await queue.put(batch)
+
+
+# Обработка пачки: пропуск существующих имён, параллельное хэширование, одна вставка на пачку.
+# Пока пароли хэшируются, соединение с БД не удерживается.
+async def import_batch(job: ImportJob, batch: List[Tuple[int, ImportAccountRow]], session_factory: async_sessionmaker):
+    async with session_factory() as db:
+        existing = set(await db.scalars(
+            select(User.username).filter(User.username.in_([row.username for _, row in batch]))
+        ))
+
+    pending = []
+    for row_number, row in batch:
+        if row.username in existing:
+            job.add_error(row_number, "Имя пользователя уже занято", row.username)
+        else:
+            pending.append((row_number, row))
+    if not pending:
+        return
+
+    hashed = await hash_passwords([row.password for _, row in pending])
+    values = [
+        {**row.model_dump(exclude={"password"}), "password": password, "is_active": True}
+        for (_, row), password in zip(pending, hashed)
+    ]
+
+    async with session_factory() as db:
+        try:
+            created = set(await db.scalars(
+                insert(User).values(values)
+                .on_conflict_do_nothing(index_elements=[User.username])
+                .returning(User.username)
+            ))
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.exception("Ошибка вставки пачки импорта %s", job.id)
+            for row_number, row in pending:
+                job.add_error(row_number, f"Ошибка записи в БД: {type(e).__name__}", row.username)
+            return
+
+    for row_number, row in pending:
+        if row.username in created:
+            job.created += 1
+            job.processed += 1
+        else:
+            job.add_error(row_number, "Имя пользователя уже занято", row.username)
+
+
+# Обработка пачек из очереди по мере приёма тела запроса; None - конец данных.
+# После ошибки очередь дочитывается, чтобы приём тела не остановился на заполненной очереди
+async def run_import(job: ImportJob, queue: asyncio.Queue, session_factory: async_sessionmaker):
+    try:
+        while (batch := await queue.get()) is not None:
+            await import_batch(job, batch, session_factory)
+    except Exception:
+        logger.exception("Импорт аккаунтов %s прерван", job.id)
+        job.finish("failed")
+        while await queue.get() is not None:
+            pass
+        return
+    job.finish("completed")
+
+
+# Фоновые задачи импорта; ссылки хранятся, чтобы задачи не были собраны сборщиком мусора
+_running_imports = set()
+
+
+# Импорт из потока: задача регистрируется сразу (прогресс доступен во время загрузки),
+# пачки обрабатываются параллельно с приёмом тела запроса
+async def import_stream(job: ImportJob, stream: AsyncIterator[bytes], is_csv: bool, session_factory: async_sessionmaker):
+    register_job(job)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.ACCOUNT_IMPORT_QUEUE_BATCHES)
+    task = asyncio.create_task(run_import(job, queue, session_factory))
+    _running_imports.add(task)
+    task.add_done_callback(_running_imports.discard)
+
+    try:
+        await receive_rows(job, stream, is_csv, queue)
+    except BaseException:
+        task.cancel()
+        job.finish("failed")
+        raise
+    if job.finished_at is None:
+        job.status = "running"
+    await queue.put(None)
+
+
+# Задачи импорта, последние первыми
+def list_import_jobs() -> List[ImportJob]:
+    return list(reversed(import_jobs.values()))
@@ -1,61 +1,68 @@
-from sqlalchemy.orm import Session
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.passwords import hash_password
 from app.models.user import User
+from app.refresh_sessions import revoke_user_tokens
 from app.schemas.accounts import UpdateAccountRequest, CreateAccountRequest
-from passlib.context import CryptContext
 from fastapi import  HTTPException
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 # Обновить аккаунт
-def update_account_service(request: UpdateAccountRequest, current_user: User, db: Session):
+async def update_account_service(request: UpdateAccountRequest, current_user: User, db: AsyncSession):
     update_data = request.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         if key == "password":
-            value = pwd_context.hash(value)
+            value = await hash_password(value)
         setattr(current_user, key, value)
-    db.commit()
+    await db.commit()
     
    
 
 # Получить все аккаунты (только для администраторов)
-def get_accounts_service(from_: int, count: int, db: Session):
-    users = db.query(User).filter(User.is_active == True).offset(from_).limit(count).all()
-    return users
+# after - ID последнего аккаунта предыдущей страницы (keyset-пагинация), иначе from_/count
+async def get_accounts_service(from_: int, count: int, db: AsyncSession, after: Optional[int] = None):
+    query = select(User).filter(User.is_active == True)
+    if after is not None:
+        query = query.filter(User.id > after)
+    else:
+        query = query.offset(from_)
+    users = await db.scalars(query.order_by(User.id).limit(count))
+    return users.all()
 
 # Создать аккаунт (только для администраторов)
-def create_account_service(request: CreateAccountRequest, db: Session):
-    hashed_password = pwd_context.hash(request.password)
+async def create_account_service(request: CreateAccountRequest, db: AsyncSession):
+    hashed_password = await hash_password(request.password)
     user = User(
         **request.model_dump(exclude={"password"}),  
         password=hashed_password
     )
     db.add(user)
-    db.commit()
+    await db.commit()
    
 
 # Обновить аккаунт по ID (только для администраторов)
-def update_account_by_id_service(id: int, request: UpdateAccountRequest, db: Session):
-    user = db.query(User).filter(User.id == id).first()
+async def update_account_by_id_service(id: int, request: UpdateAccountRequest, db: AsyncSession):
+    user = await db.scalar(select(User).filter(User.id == id))
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
     update_data = request.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         if key == "password":
-            value = pwd_context.hash(value)
+            value = await hash_password(value)
         setattr(user, key, value)
     
-    db.commit()
+    await db.commit()
     
     
 
 # Удалить аккаунт (только для администраторов)
-def delete_account_service(id: int, db: Session):
-    user = db.query(User).filter(User.id == id).first()
+async def delete_account_service(id: int, db: AsyncSession):
+    user = await db.scalar(select(User).filter(User.id == id))
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     user.is_active = False  
-    db.commit()
+    await revoke_user_tokens(user.id, db)
     
     
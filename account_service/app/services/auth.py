@@ -1,24 +1,25 @@
 from datetime import datetime, timezone
 import time
-from sqlalchemy.orm import Session
+from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, Response
-from jose import ExpiredSignatureError, jwt, JWTError
-from passlib.context import CryptContext
+from jose import ExpiredSignatureError, JWTError
+from app.core.passwords import hash_password, verify_password
 from app.token_blacklist import add_to_blacklist, is_blacklisted
+from app.models.refresh_session import RefreshSession
 from app.models.user import User
+from app.refresh_sessions import create_session, revoke_session, revoke_user_tokens, rotate_session, session_expiration
 from app.schemas.auth import SignInRequest, SignUpRequest
-from app.utils import create_access_token, create_refresh_token
-from app.core.config import settings
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.utils import ACCESS_TOKEN_TYPE, REFRESH_TOKEN_TYPE, create_access_token, create_refresh_token, decode_token_of_type
 
 # Зарегистрироваться
-def sign_up_service(request: SignUpRequest, db: Session):
-    user_exists = db.query(User).filter(User.username == request.username).first()
+async def sign_up_service(request: SignUpRequest, db: AsyncSession):
+    user_exists = await db.scalar(select(User).filter(User.username == request.username))
     if user_exists:
         raise HTTPException(status_code=400, detail="Имя пользователя уже занято")
 
-    hashed_password = pwd_context.hash(request.password)
+    hashed_password = await hash_password(request.password)
 
     new_user = User(
         **request.model_dump(exclude={"password"}),  
@@ -27,22 +28,32 @@ def sign_up_service(request: SignUpRequest, db: Session):
     )
 
     db.add(new_user)
-    db.commit()
+    await db.commit()
 
 
 
 # Войти
-def sign_in_service(request: SignInRequest, response: Response, db: Session):
-    user = db.query(User).filter(User.username == request.username, User.is_active == True).first()
+async def sign_in_service(request: SignInRequest, response: Response, db: AsyncSession):
+    user = await db.scalar(select(User).filter(User.username == request.username, User.is_active == True))
 
     if not user:
         raise HTTPException(status_code=404, detail="Имя пользователя не найдено")
 
-    if not pwd_context.verify(request.password, user.password):
+    if not await verify_password(request.password, user.password):
         raise HTTPException(status_code=401, detail="Неверный пароль")
 
-    access_token = create_access_token(data={"username": user.username, "roles": user.roles, "user_id": user.id})
-    refresh_token = create_refresh_token(data={"username": user.username, "roles": user.roles, "user_id": user.id})
+    session = await create_session(user.id, db)
+    await db.commit()
+    return issue_tokens(user, session)
+
+# Выпустить пару токенов для сессии
+def issue_tokens(user: User, session: RefreshSession) -> dict:
+    claims = {"username": user.username, "roles": user.roles, "user_id": user.id, "sid": session.id}
+    access_token = create_access_token(data=claims)
+    refresh_token = create_refresh_token(
+        data={**claims, "jti": session.current_jti},
+        expires_delta=session_expiration(session),
+    )
 
     return {
         "access_token": access_token,
@@ -50,15 +61,16 @@ def sign_in_service(request: SignInRequest, response: Response, db: Session):
     }
 
 # Выйти
-def sign_out_service(access_token: str, db: Session):
+async def sign_out_service(access_token: str, db: AsyncSession):
     try:
-        token_info = jwt.decode(access_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        token_info = decode_token_of_type(access_token, ACCESS_TOKEN_TYPE)
         expiration = token_info.get("exp")
 
         if expiration is None:
             raise HTTPException(status_code=400, detail="Невозможно определить срок действия токена")
         
-        add_to_blacklist(access_token, datetime.fromtimestamp(expiration, tz=timezone.utc), db)
+        await revoke_session(token_info.get("sid"), db)
+        await add_to_blacklist(access_token, datetime.fromtimestamp(expiration, tz=timezone.utc), db)
         
     except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Токен уже истек")
@@ -68,18 +80,18 @@ def sign_out_service(access_token: str, db: Session):
 
 
 # Проверка Token (интроспекция токена)
-def validate_token_service(access_token: str, db: Session):
+async def validate_token_service(access_token: str, db: AsyncSession):
     if access_token is None:
         raise HTTPException(status_code=401, detail="access token не найден")
 
+    return check_access_token(access_token)
+
+# Проверить подпись, отзыв и срок действия токена
+def check_access_token(access_token: str) -> dict:
     try:
-        token_info = jwt.decode(
-            access_token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM],
-        )
+        token_info = decode_token_of_type(access_token, ACCESS_TOKEN_TYPE)
 
-        if is_blacklisted(access_token, db):
+        if is_blacklisted(access_token, token_info):
             raise HTTPException(status_code=401, detail="Недействительный Token доступа")
 
         if token_info.get("exp") and token_info["exp"] < int(time.time()):
@@ -92,24 +104,34 @@ def validate_token_service(access_token: str, db: Session):
     except JWTError:
         raise HTTPException(status_code=401, detail="Недействительный Token доступа")
 
-# Обновить Token
-async def refresh_token_service(refresh_token: str):
-    credentials_exception = HTTPException(
-    status_code=401,
-    detail={"message": "Не авторизовано"}
-    )
+# Ответ интроспекции в формате /api/Authentication/Validate
+def token_info_response(token_info: dict) -> dict:
+    return {
+        "username": token_info.get("username"),
+        "user_id": token_info.get("user_id"),
+        "roles": token_info.get("roles", []),
+        "issued_at": datetime.fromtimestamp(token_info.get("iat", 0), tz=timezone.utc).isoformat() + "Z",
+        "expires_at": datetime.fromtimestamp(token_info.get("exp", 0), tz=timezone.utc).isoformat() + "Z",
+        "token_is_valid": True
+    }
+
+# Пакетная проверка токенов: отзыв проверяется по набору в памяти, без запросов к БД
+def validate_tokens_batch_service(access_tokens: List[str]) -> List[dict]:
+    results = []
+    for access_token in access_tokens:
+        try:
+            results.append(token_info_response(check_access_token(access_token)))
+        except HTTPException as e:
+            results.append({"token_is_valid": False, "detail": e.detail})
+    return results
 
+# Обновить Token
+async def refresh_token_service(refresh_token: str, db: AsyncSession):
     if refresh_token is None:
         raise HTTPException(status_code=400, detail="refresh_token не предоставлен")
 
     try:
-        payload = jwt.decode(refresh_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("username")
-        roles: list = payload.get("roles", [])
-        
-        if username is None:
-            raise credentials_exception
-        
+        payload = decode_token_of_type(refresh_token, REFRESH_TOKEN_TYPE)
     except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Срок действия refresh_token истек")
     except JWTError:
@@ -118,11 +140,23 @@ async def refresh_token_service(refresh_token: str):
             detail="Неверный refresh_token"
         )
 
+    session = await rotate_session(payload.get("sid"), payload.get("jti"), db)
+    user = await db.scalar(select(User).filter(User.id == session.user_id, User.is_active == True))
+    if user is None:
+        raise HTTPException(status_code=401, detail={"message": "Не авторизовано"})
 
-    access_token = create_access_token(data={"username": username, "roles": roles})
-    new_refresh_token = create_refresh_token(data={"username": username, "roles": roles})
+    await db.commit()
+    return issue_tokens(user, session)
 
-    return {
-        "access_token": access_token,
-        "refresh_token": new_refresh_token,
-    }
\ No newline at end of file
+# Выйти на всех устройствах
+async def sign_out_all_service(access_token: str, db: AsyncSession):
+    try:
+        token_info = decode_token_of_type(access_token, ACCESS_TOKEN_TYPE)
+    except ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Токен уже истек")
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Невалидный токен")
+
+    if token_info.get("user_id") is None:
+        raise HTTPException(status_code=401, detail="Невалидный токен")
+    await revoke_user_tokens(token_info["user_id"], db)
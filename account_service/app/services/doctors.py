@@ -1,21 +1,40 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
 from fastapi import HTTPException
-from typing import Optional
-from sqlalchemy import or_
+from typing import List, Optional
+from sqlalchemy import or_, select, text
+from app.db.indexes import ACTIVE_DOCTOR_PREDICATE
 
 # Получить всех докторы
-def get_doctors_service(db: Session, name_filter: Optional[str] = None, from_: int = 0, count: int = 10):
-    query = db.query(User).filter(User.roles.any('Doctor'), User.is_active == True)
+# after - ID последнего доктора предыдущей страницы (keyset-пагинация), иначе from_/count
+async def get_doctors_service(db: AsyncSession, name_filter: Optional[str] = None, from_: int = 0, count: int = 10, after: Optional[int] = None):
+    query = select(User).filter(text(ACTIVE_DOCTOR_PREDICATE))
     if name_filter:
         query = query.filter(
             or_(User.firstName.ilike(f"%{name_filter}%"), User.lastName.ilike(f"%{name_filter}%"))
         )
-    return query.offset(from_).limit(count).all()
+    if after is not None:
+        query = query.filter(User.id > after)
+    else:
+        query = query.offset(from_)
+    doctors = await db.scalars(query.order_by(User.id).limit(count))
+    return doctors.all()
 
 # Получить доктор по ID
-def get_doctor_by_id_service(db: Session, doctor_id: int):
-    doctor = db.query(User).filter(User.id == doctor_id, User.roles.any('Doctor'), User.is_active == True).first()
+async def get_doctor_by_id_service(db: AsyncSession, doctor_id: int):
+    doctor = await db.scalar(select(User).filter(User.id == doctor_id, User.roles.any('Doctor'), User.is_active == True))
     if not doctor:
         raise HTTPException(status_code=404, detail="Доктор не найден")
-    return doctor
\ No newline at end of file
+    return doctor
+
+# Получить докторов по списку ID одним запросом
+async def get_doctors_by_ids_service(db: AsyncSession, doctor_ids: List[int]):
+    doctor_ids = list(dict.fromkeys(doctor_ids))
+    doctors = await db.scalars(
+        select(User).filter(User.id.in_(doctor_ids), User.roles.any('Doctor'), User.is_active == True)
+    )
+    found = {doctor.id: doctor for doctor in doctors}
+    return {
+        "doctors": [found[doctor_id] for doctor_id in doctor_ids if doctor_id in found],
+        "missing": [doctor_id for doctor_id in doctor_ids if doctor_id not in found],
+    }
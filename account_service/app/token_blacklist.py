@@ -1,13 +1,181 @@
-from datetime import datetime
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from jose import JWTError, jwt
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.core.config import settings
+from app.models.refresh_session import RefreshSession
 from app.models.token_blacklist import Blacklist
-from sqlalchemy.orm import Session
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Запас при синхронизации: строки, закоммиченные с опозданием, не будут пропущены
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def access_token_lifetime() -> timedelta:
+    return timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+
+# Идентификатор токена: jti, а для токенов без jti - SHA-256 самого токена
+def get_token_id(token: str) -> str:
+    try:
+        jti = jwt.get_unverified_claims(token).get("jti")
+    except JWTError:
+        jti = None
+    return jti or hashlib.sha256(token.encode()).hexdigest()
+
+
+# Отозванные токены в памяти процесса. Загружаются при старте и догружаются из БД
+# фоновой синхронизацией, поэтому выход в одном воркере виден остальным
+# не позже чем через REVOCATION_SYNC_INTERVAL секунд.
+# Кроме отдельных токенов хранится отметка по пользователю (users.tokens_valid_after):
+# все токены пользователя, выпущенные до неё, недействительны.
+class RevocationStore:
+    def __init__(self):
+        self._revoked: Dict[str, datetime] = {}
+        self._last_revoked_at: Optional[datetime] = None
+        self._valid_after: Dict[int, float] = {}
+        self._last_valid_after: Optional[datetime] = None
+        self.checks = 0
+        self.revoked_hits = 0
+        self.synced_rows = 0
+        self.swept_rows = 0
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def add(self, token_id: str, expiration: datetime):
+        self._revoked[token_id] = expiration
+
+    def set_valid_after(self, user_id: int, valid_after: datetime):
+        self._valid_after[user_id] = valid_after.replace(tzinfo=timezone.utc).timestamp()
+
+    def is_revoked(self, token_id: str, user_id: Optional[int] = None, issued_at: Optional[float] = None) -> bool:
+        self.checks += 1
+        if token_id in self._revoked:
+            self.revoked_hits += 1
+            return True
+        valid_after = self._valid_after.get(user_id)
+        if valid_after is not None and (issued_at is None or issued_at <= valid_after):
+            self.revoked_hits += 1
+            return True
+        return False
+
+    def _remember_valid_after(self, rows):
+        for user_id, valid_after in rows:
+            self.set_valid_after(user_id, valid_after)
+            if self._last_valid_after is None or valid_after > self._last_valid_after:
+                self._last_valid_after = valid_after
+
+    def _remember(self, rows):
+        for token_id, expiration, revoked_at in rows:
+            self._revoked[token_id] = expiration
+            if self._last_revoked_at is None or revoked_at > self._last_revoked_at:
+                self._last_revoked_at = revoked_at
+            self.synced_rows += 1
+
+    # Первый вызов загружает всё актуальное, последующие - только новые записи
+    async def sync(self, db: AsyncSession):
+        query = select(Blacklist.token_id, Blacklist.expiration, Blacklist.revoked_at)
+        if self._last_revoked_at is None:
+            query = query.filter(Blacklist.expiration > utcnow())
+        else:
+            query = query.filter(Blacklist.revoked_at > self._last_revoked_at - SYNC_OVERLAP)
+        self._remember(await db.execute(query))
+
+        query = select(User.id, User.tokens_valid_after)
+        if self._last_valid_after is None:
+            query = query.filter(User.tokens_valid_after > utcnow() - access_token_lifetime())
+        else:
+            query = query.filter(User.tokens_valid_after > self._last_valid_after - SYNC_OVERLAP)
+        self._remember_valid_after(await db.execute(query))
+
+    async def load(self, db: AsyncSession):
+        await self.sync(db)
+
+    # Истёкшие токены и так не пройдут проверку срока действия, их можно забыть.
+    # Отметка пользователя не нужна, когда истекли все access-токены, выпущенные до неё.
+    def prune(self) -> int:
+        now = utcnow()
+        expired = [token_id for token_id, expiration in self._revoked.items() if expiration <= now]
+        for token_id in expired:
+            del self._revoked[token_id]
+
+        oldest = (now - access_token_lifetime()).replace(tzinfo=timezone.utc).timestamp()
+        for user_id in [user_id for user_id, valid_after in self._valid_after.items() if valid_after <= oldest]:
+            del self._valid_after[user_id]
+        return len(expired)
+
+    async def sweep(self, db: AsyncSession) -> int:
+        self.prune()
+        result = await db.execute(delete(Blacklist).filter(Blacklist.expiration <= utcnow()))
+        await db.execute(delete(RefreshSession).filter(RefreshSession.expires_at <= utcnow()))
+        await db.commit()
+        self.swept_rows += result.rowcount
+        return result.rowcount
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._revoked),
+            "users_with_watermark": len(self._valid_after),
+            "checks": self.checks,
+            "revoked_hits": self.revoked_hits,
+            "synced_rows": self.synced_rows,
+            "swept_rows": self.swept_rows,
+        }
+
+
+revocation_store = RevocationStore()
+
+
+# Фоновая синхронизация с БД и удаление истёкших записей
+async def run_revocation_maintenance(session_factory: async_sessionmaker):
+    loop = asyncio.get_running_loop()
+    next_sweep = loop.time()
+    while True:
+        try:
+            async with session_factory() as db:
+                await revocation_store.sync(db)
+                if loop.time() >= next_sweep:
+                    await revocation_store.sweep(db)
+                    next_sweep = loop.time() + settings.REVOCATION_SWEEP_INTERVAL
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Ошибка синхронизации отозванных токенов")
+        await asyncio.sleep(settings.REVOCATION_SYNC_INTERVAL)
+
 
 # Отозвать токен после выхода
-def add_to_blacklist(token: str, expiration: datetime, db: Session):
-    blacklisted_token = Blacklist(token=token, expiration=expiration)
-    db.add(blacklisted_token)
-    db.commit()
-
-# проверьте, отозван ли токен
-def is_blacklisted(token: str, db: Session) -> bool:
-    return db.query(Blacklist).filter(Blacklist.token == token).first() is not None
+async def add_to_blacklist(token: str, expiration: datetime, db: AsyncSession):
+    token_id = get_token_id(token)
+    if expiration.tzinfo is not None:
+        expiration = expiration.astimezone(timezone.utc).replace(tzinfo=None)
+
+    await db.execute(
+        insert(Blacklist)
+        .values(token_id=token_id, expiration=expiration, revoked_at=utcnow())
+        .on_conflict_do_nothing(index_elements=[Blacklist.token_id])
+    )
+    await db.commit()
+    revocation_store.add(token_id, expiration)
+
+# проверьте, отозван ли токен. claims - уже проверенное содержимое токена, если есть
+def is_blacklisted(token: str, claims: Optional[dict] = None) -> bool:
+    if claims is None:
+        try:
+            claims = jwt.get_unverified_claims(token)
+        except JWTError:
+            claims = {}
+    token_id = claims.get("jti") or hashlib.sha256(token.encode()).hexdigest()
+    return revocation_store.is_revoked(token_id, claims.get("user_id"), claims.get("iat"))
@@ -1,27 +1,54 @@
+import uuid
 from datetime import datetime, timedelta, timezone
 from typing import List
 from fastapi import Depends, HTTPException, Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import ExpiredSignatureError, JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.token_blacklist import is_blacklisted
 from app.core.config import settings
+from app.core.keys import keyring
 from app.db.session import get_db
 
 bearer_scheme = HTTPBearer() 
 
+# Тип токена (claim typ): refresh token нельзя использовать как токен доступа и наоборот
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
+
+# Подписать токен активным ключом (kid указывается в заголовке)
+def encode_token(claims: dict) -> str:
+    key, headers = keyring.signing_key()
+    return jwt.encode(claims, key, algorithm=settings.ALGORITHM, headers=headers)
+
+# Проверить подпись токена ключом, соответствующим его kid
+def decode_token(token: str) -> dict:
+    key = keyring.verification_key(jwt.get_unverified_header(token).get("kid"))
+    if key is None:
+        raise JWTError("Неизвестный ключ подписи")
+    return jwt.decode(token, key, algorithms=[settings.ALGORITHM])
+
+# Проверить подпись и тип токена
+def decode_token_of_type(token: str, token_type: str) -> dict:
+    payload = decode_token(token)
+    if payload.get("typ") != token_type:
+        raise JWTError("Неверный тип токена")
+    return payload
+
 # Создать access token
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=60)
+        expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({
         "exp": expire,
-        "iat": datetime.now(timezone.utc).timestamp()  
+        "iat": datetime.now(timezone.utc).timestamp(),
+        "typ": ACCESS_TOKEN_TYPE,
     })
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    to_encode.setdefault("jti", uuid.uuid4().hex)
+    return encode_token(to_encode)
 
 # Создать refresh token
 def create_refresh_token(data: dict, expires_delta: timedelta | None = None):
@@ -29,16 +56,18 @@ def create_refresh_token(data: dict, expires_delta: timedelta | None = None):
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
-        expire = datetime.now(timezone.utc) + timedelta(days=30)  
+        expire = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_SESSION_EXPIRE_DAYS)  
     to_encode.update({
         "exp": expire,
-        "iat": datetime.now(timezone.utc).timestamp()  
+        "iat": datetime.now(timezone.utc).timestamp(),
+        "typ": REFRESH_TOKEN_TYPE,
     })
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    to_encode.setdefault("jti", uuid.uuid4().hex)
+    return encode_token(to_encode)
 
 
 # Проверить авторизованного пользователя
-async def verify_user_token(token: HTTPAuthorizationCredentials = Security(bearer_scheme), db: Session = Depends(get_db)):
+async def verify_user_token(token: HTTPAuthorizationCredentials = Security(bearer_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=401,
         detail="Не авторизовано",
@@ -51,10 +80,10 @@ async def verify_user_token(token: HTTPAuthorizationCredentials = Security(beare
     try:
         access_token = token.credentials
 
-        payload = jwt.decode(access_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_token_of_type(access_token, ACCESS_TOKEN_TYPE)
         username: str = payload.get("username")
 
-        if is_blacklisted(access_token, db):
+        if is_blacklisted(access_token, payload):
             raise HTTPException(status_code=401, detail="Token недействителен")
 
         if username is None:
@@ -75,7 +104,7 @@ def check_role(roles: List[str], required_roles: List[str]):
 # Получить текущего администратора
 async def verify_admin_user(
     token: str = Depends(verify_user_token), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     
     if "Admin" not in token.get("roles", []):
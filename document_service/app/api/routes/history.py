@@ -1,7 +1,7 @@
 from typing import List
 from elasticsearch import AsyncElasticsearch
 from fastapi import APIRouter, Depends, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.history import HistoryCreate, HistoryUpdate, HistoryResponse
 from app.services.history import (
     create_history_service,
@@ -40,7 +40,7 @@ def history_to_dict(history):
 @router.get("/History/Account/{id}/", include_in_schema=False, response_model=List[HistoryResponse], status_code=200)
 async def get_history_by_account_id(
     id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: dict = Depends(verify_user_token),
     es: AsyncElasticsearch = Depends(get_es)
 ):
@@ -59,7 +59,7 @@ async def get_history_by_account_id(
 @router.get("/History/{id}/", include_in_schema=False, response_model=HistoryResponse, status_code=200)
 async def get_history_by_id(
     id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: dict = Depends(verify_user_token),
     es: AsyncElasticsearch = Depends(get_es)
 ):
@@ -79,7 +79,7 @@ async def get_history_by_id(
 async def create_history(
     request: Request,
     history: HistoryCreate,  
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: dict = Depends(verify_user_token),
     es: AsyncElasticsearch = Depends(get_es)
 ):
@@ -98,7 +98,7 @@ async def update_history(
     request: Request,
     id: int,
     history: HistoryUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: dict = Depends(verify_user_token),
     es: AsyncElasticsearch = Depends(get_es)
 ):
@@ -0,0 +1,130 @@
+import time
+from collections import deque
+from typing import Optional
+import httpx
+from app.core.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+# Запрос не отправлялся: цепь к сервису разомкнута
+class CircuitOpenError(httpx.TransportError):
+    pass
+
+
+# Автоматический выключатель на один сервис. После CIRCUIT_FAILURE_THRESHOLD ошибок
+# подряд запросы отклоняются сразу, через CIRCUIT_RESET_TIMEOUT секунд пропускается
+# один пробный запрос: успех замыкает цепь, ошибка снова размыкает.
+class CircuitBreaker:
+    def __init__(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= settings.CIRCUIT_RESET_TIMEOUT:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    # Запрос отменён (например, проигравший дублирующий): пробный слот освобождается
+    def release(self):
+        self.probe_in_flight = False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= settings.CIRCUIT_FAILURE_THRESHOLD:
+            if self.state != OPEN:
+                self.opened += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+# Бюджет повторов: каждый запрос добавляет HTTP_RETRY_BUDGET_RATIO токена, повтор или
+# дублирующий запрос тратит один. Во время сбоя дополнительная нагрузка на сервис
+# ограничена долей от обычного потока запросов.
+class RetryBudget:
+    def __init__(self):
+        self.tokens = settings.HTTP_RETRY_BUDGET_MAX
+        self.exhausted = 0
+
+    def deposit(self):
+        self.tokens = min(settings.HTTP_RETRY_BUDGET_MAX, self.tokens + settings.HTTP_RETRY_BUDGET_RATIO)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        self.exhausted += 1
+        return False
+
+
+# Последние длительности успешных запросов, для задержки перед дублирующим запросом
+class LatencyWindow:
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def add(self, elapsed: float):
+        self._samples.append(elapsed)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self._samples) < settings.HTTP_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+# Состояние одного сервиса (host:port)
+class TargetPolicy:
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self.budget = RetryBudget()
+        self.latency = LatencyWindow()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+
+    # Через сколько секунд отправлять дублирующий GET: p95 последних запросов
+    def hedge_delay(self) -> Optional[float]:
+        if not settings.HTTP_HEDGE_ENABLED:
+            return None
+        p95 = self.latency.percentile(0.95)
+        return None if p95 is None else max(p95, settings.HTTP_HEDGE_MIN_DELAY)
+
+    def stats(self) -> dict:
+        p95 = self.latency.percentile(0.95)
+        return {
+            **self.breaker.stats(),
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "deadline_exceeded": self.deadline_exceeded,
+            "retry_budget": round(self.budget.tokens, 2),
+            "retry_budget_exhausted": self.budget.exhausted,
+            "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+        }
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from fastapi import HTTPException
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Накопленные длительности проверок по названию (для /metrics)
+class ValidationStats:
+    def __init__(self):
+        self._checks: Dict[str, dict] = {}
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def record(self, name: str, elapsed: float, outcome: str):
+        check = self._checks.setdefault(
+            name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "ok": 0, "failed": 0, "cancelled": 0}
+        )
+        elapsed_ms = elapsed * 1000
+        check["count"] += 1
+        check["total_ms"] += elapsed_ms
+        check["max_ms"] = max(check["max_ms"], elapsed_ms)
+        check[outcome] += 1
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "checks": {
+                name: {
+                    **check,
+                    "total_ms": round(check["total_ms"], 2),
+                    "max_ms": round(check["max_ms"], 2),
+                    "avg_ms": round(check["total_ms"] / check["count"], 2),
+                }
+                for name, check in self._checks.items()
+            },
+        }
+
+
+validation_stats = ValidationStats()
+
+
+# Проверки связанных данных перед записью. Независимые проверки (больница, врач)
+# выполняются одновременно, поэтому запись ждёт самую медленную из них, а не сумму.
+# Первая ошибка отменяет остальные проверки; на всё отводится deadline секунд.
+class ValidationPipeline:
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = settings.VALIDATION_DEADLINE if deadline is None else deadline
+        self._checks: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self.timings: Dict[str, float] = {}
+
+    def add(self, name: str, check: Callable[[], Awaitable[Any]]):
+        self._checks[name] = check
+
+    async def _timed(self, name: str, check: Callable[[], Awaitable[Any]]):
+        started = time.perf_counter()
+        outcome = "failed"
+        try:
+            result = await check()
+            outcome = "ok"
+            return result
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            self.timings[name] = time.perf_counter() - started
+            validation_stats.record(name, self.timings[name], outcome)
+
+    # Возвращает результаты проверок по названию; при ошибке - исключение первой упавшей
+    async def run(self) -> Dict[str, Any]:
+        if not self._checks:
+            return {}
+        validation_stats.runs += 1
+        tasks = {name: asyncio.create_task(self._timed(name, check)) for name, check in self._checks.items()}
+        try:
+            done, pending = await asyncio.wait(
+                tasks.values(), timeout=self.deadline, return_when=asyncio.FIRST_EXCEPTION
+            )
+        except asyncio.CancelledError:
+            await _cancel(tasks.values())
+            raise
+
+        failed = [task for task in tasks.values() if task in done and task.exception() is not None]
+        if pending:
+            await _cancel(pending)
+        logger.debug("Проверки: %s", {name: round(elapsed * 1000, 2) for name, elapsed in self.timings.items()})
+
+        if failed:
+            validation_stats.failures += 1
+            raise failed[0].exception()
+        if pending:
+            validation_stats.timeouts += 1
+            raise HTTPException(status_code=504, detail="Превышено время проверки связанных данных")
+        return {name: task.result() for name, task in tasks.items()}
+
+
+async def _cancel(tasks):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
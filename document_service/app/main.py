@@ -1,8 +1,13 @@
 import asyncio
-from fastapi import FastAPI, HTTPException, Depends
+from typing import Literal, Optional
+from fastapi import FastAPI, HTTPException, Depends, Security
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core.http_client import http_client
+from app.core.validation import validation_stats
 from app.db.database import Base, engine
+from app.utils import bearer_scheme, invalidate_lookups, invalidate_token, lookup_cache_stats, token_cache, verify_admin_user
 from app.api.routes import history
 from elasticsearch import AsyncElasticsearch, ConnectionError, NotFoundError
 
@@ -25,12 +30,17 @@ async def lifespan(app: FastAPI):
     try:
         await wait_for_elasticsearch(es)  
         app.state.es = es
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await http_client.start()
         yield
     except ConnectionError as e:
         raise RuntimeError(f"Ошибка подключения к Elasticsearch: {str(e)}")
     finally:
         if es:
             await es.close()
+        await http_client.close()
+        await engine.dispose()
 
 app = FastAPI(
     title="МИКРОСЕРВИС ДОКУМЕНТОВ",
@@ -43,7 +53,6 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-Base.metadata.create_all(bind=engine)
 app.include_router(history.router, prefix="/api", tags=["History"])
 
 app.add_middleware(
@@ -58,6 +67,32 @@ app.add_middleware(
 def read_root():
     return {"message": "Document service"}
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return {
+        "http_client": http_client.stats(),
+        "token_cache": token_cache.stats(),
+        "lookup_cache": lookup_cache_stats(),
+        "validation": validation_stats.stats(),
+    }
+
+# Немедленный сброс закэшированной проверки токена в этом воркере (без него запись истекает через TOKEN_CACHE_TTL)
+@app.post("/TokenCache/Invalidate", include_in_schema=False)
+def invalidate_token_cache(token: HTTPAuthorizationCredentials = Security(bearer_scheme)):
+    invalidate_token(token.credentials)
+    return {"message": "Кэш токена сброшен"}
+
+# Сброс кэша больниц и врачей: одна запись (kind и id) или весь кэш. Только для администраторов
+@app.post("/LookupCache/Invalidate", include_in_schema=False)
+def invalidate_lookup_cache(
+    kind: Optional[Literal["doctors", "hospitals"]] = None,
+    id: Optional[int] = None,
+    user: dict = Depends(verify_admin_user)
+):
+    if id is not None and kind is None:
+        raise HTTPException(status_code=400, detail="Для сброса записи по ID укажите kind")
+    return {"message": "Кэш сброшен", "invalidated": invalidate_lookups(kind, id)}
+
 @app.get("/search/{query}", 
     summary="Поиск документов", 
     description="Поиск документов в Elasticsearch на основе заданного поискового запроса. Ищет совпадения в содержимом документа."
@@ -1,11 +1,12 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String
 from app.db.database import Base
+from app.db.types import UTCDateTime
 
 class History(Base):
     __tablename__ = "histories"
     
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(DateTime, nullable=False)
+    date = Column(UTCDateTime, nullable=False)
     patient_id = Column(Integer, nullable=False) 
     hospital_id = Column(Integer, nullable=False)  
     doctor_id = Column(Integer, nullable=False)  
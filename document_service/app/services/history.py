@@ -1,12 +1,14 @@
-from typing import List
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.history import History
 from app.schemas.history import HistoryCreate, HistoryUpdate, HistoryResponse
+from app.core.validation import ValidationPipeline
 from app.utils import get_doctor_by_id, get_hospital_by_id
 from fastapi import HTTPException, Request
 
 # Получение истории посещений и назначений аккаунта
-async def get_history_by_account_id_service(id: int, user: dict, db: Session) -> List[HistoryResponse]:
+async def get_history_by_account_id_service(id: int, user: dict, db: AsyncSession) -> List[HistoryResponse]:
 
     user_roles = user.get("roles", [])
     user_id = user.get("user_id")
@@ -14,7 +16,7 @@ async def get_history_by_account_id_service(id: int, user: dict, db: Session) ->
     if id != user_id and "Doctor" not in user_roles:
         raise HTTPException(status_code=403, detail="Не авторизован: только врач или пациент могут просматривать эту историю")
     
-    histories = db.query(History).filter(History.patient_id == id).all()
+    histories = (await db.scalars(select(History).filter(History.patient_id == id))).all()
     
     if not histories:
         raise HTTPException(status_code=404, detail="История не найдена")
@@ -22,11 +24,11 @@ async def get_history_by_account_id_service(id: int, user: dict, db: Session) ->
     return histories
 
 # Получение подробной информации о посещении и назначениях
-async def get_history_by_id_service(id: int, user: dict, db: Session) -> HistoryResponse:
+async def get_history_by_id_service(id: int, user: dict, db: AsyncSession) -> HistoryResponse:
     user_roles = user.get("roles", [])
     user_id = user.get("user_id")
 
-    history = db.query(History).filter(History.id == id).first()
+    history = await db.scalar(select(History).filter(History.id == id))
     if not history:
         raise HTTPException(status_code=404, detail="История не найдена")
 
@@ -36,19 +38,31 @@ async def get_history_by_id_service(id: int, user: dict, db: Session) -> History
     return history
 
 
-# Создание истории посещения и назначения
-async def create_history_service(history: HistoryCreate, user: dict, db: Session, request: Request) -> HistoryResponse:
-    doctor_info = await get_doctor_by_id(history.doctor_id, request)
+# Врач существует
+async def check_doctor(doctor_id: int, request: Request) -> dict:
+    doctor_info = await get_doctor_by_id(doctor_id, request)
     if not doctor_info:
         raise HTTPException(status_code=400, detail="Недействительный ID врача")
+    return doctor_info
 
-    hospital_info = await get_hospital_by_id(history.hospital_id, request)
+# Больница существует и в ней есть кабинет room. При обновлении (room_required=False)
+# кабинет проверяется, только если он указан
+async def check_hospital_room(hospital_id: int, room: Optional[str], request: Request, room_required: bool = True) -> dict:
+    hospital_info = await get_hospital_by_id(hospital_id, request)
     if not hospital_info:
         raise HTTPException(status_code=400, detail="Недействительный ID больницы")
 
     available_rooms = hospital_info.get('rooms', [])
-    if history.room not in available_rooms:
+    if (room or room_required) and room not in available_rooms:
         raise HTTPException(status_code=400, detail="Неверная комната. Комната не принадлежит указанной больнице")
+    return hospital_info
+
+# Создание истории посещения и назначения
+async def create_history_service(history: HistoryCreate, user: dict, db: AsyncSession, request: Request) -> HistoryResponse:
+    pipeline = ValidationPipeline()
+    pipeline.add("doctor", lambda: check_doctor(history.doctor_id, request))
+    pipeline.add("hospital", lambda: check_hospital_room(history.hospital_id, history.room, request))
+    await pipeline.run()
 
     user_roles = user.get("roles", [])
     user_id = user.get("user_id")
@@ -73,31 +87,24 @@ async def create_history_service(history: HistoryCreate, user: dict, db: Session
     )
 
     db.add(new_history)
-    db.commit()
-    db.refresh(new_history)
+    await db.commit()
+    await db.refresh(new_history)
 
     return new_history
 
 
 # Обновление истории посещения и назначения
-async def update_history_service(id: int, history: HistoryUpdate, user:dict, db: Session, request: Request) -> HistoryResponse:
-    existing_history = db.query(History).filter(History.id == id).first()
+async def update_history_service(id: int, history: HistoryUpdate, user:dict, db: AsyncSession, request: Request) -> HistoryResponse:
+    existing_history = await db.scalar(select(History).filter(History.id == id))
     if not existing_history:
         raise HTTPException(status_code=404, detail="История не найдена")
     
+    pipeline = ValidationPipeline()
     if history.doctor_id:
-        doctor_info = await get_doctor_by_id(history.doctor_id, request)
-        if not doctor_info:
-            raise HTTPException(status_code=400, detail="Недействительный ID врача")
-    
+        pipeline.add("doctor", lambda: check_doctor(history.doctor_id, request))
     if history.hospital_id:
-        hospital_info = await get_hospital_by_id(history.hospital_id, request)
-        if not hospital_info:
-            raise HTTPException(status_code=400, detail="Недействительный ID больницы")
-        
-        available_rooms = hospital_info.get('rooms', [])
-        if history.room and history.room not in available_rooms:
-            raise HTTPException(status_code=400, detail="Неверная комната. Комната не принадлежит указанной больнице")
+        pipeline.add("hospital", lambda: check_hospital_room(history.hospital_id, history.room, request, room_required=False))
+    await pipeline.run()
         
     user_roles = user.get("roles", [])
     user_id = user.get("user_id") 
@@ -120,8 +127,8 @@ async def update_history_service(id: int, history: HistoryUpdate, user:dict, db:
     existing_history.room = history.room
     existing_history.data = history.data
 
-    db.commit()
-    db.refresh(existing_history)
+    await db.commit()
+    await db.refresh(existing_history)
 
     return existing_history
 
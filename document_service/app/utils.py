@@ -1,12 +1,69 @@
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+import asyncio
+import hashlib
 import httpx
+from jose import JWTError
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
 from fastapi import Depends, HTTPException, Request, Security
+from app.core.cache import MISSING, TTLCache
 from app.core.config import settings
+from app.core.http_client import http_client
+from app.core.resilience import CircuitOpenError
+from app.core.jwks import decode_token_locally, token_info_from_claims
+from app.core.lookup_cache import LookupCache
 
 ACCOUNT_SERVICE_URL = settings.ACCOUNT_SERVICE_URL
+DOCTORS_BATCH_SIZE = 100
 HOSPITAL_SERVICE_URL = settings.HOSPITAL_SERVICE_URL
 
 bearer_scheme = HTTPBearer() 
+# Результат проверки токена хранится не дольше TOKEN_CACHE_TTL (несколько секунд): токен,
+# с которым вышли, перестаёт приниматься каждым воркером не позже чем через это время,
+# без участия клиента
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.TOKEN_CACHE_TTL)
+doctor_cache = LookupCache(
+    maxsize=settings.LOOKUP_CACHE_MAX_SIZE,
+    ttl=settings.DOCTOR_CACHE_TTL,
+    negative_ttl=settings.LOOKUP_CACHE_NEGATIVE_TTL,
+)
+hospital_cache = LookupCache(
+    maxsize=settings.LOOKUP_CACHE_MAX_SIZE,
+    ttl=settings.HOSPITAL_CACHE_TTL,
+    negative_ttl=settings.LOOKUP_CACHE_NEGATIVE_TTL,
+)
+lookup_caches = {"doctors": doctor_cache, "hospitals": hospital_cache}
+
+# Ключ кэша интроспекции: хэш токена, сам токен в памяти не хранится
+def token_cache_key(access_token: str) -> str:
+    return hashlib.sha256(access_token.encode()).hexdigest()
+
+# Сколько секунд токен ещё действителен по ответу Validate
+def token_ttl(token_info: dict) -> float:
+    expires_at = token_info.get("expires_at")
+    if not expires_at:
+        return 0.0
+    try:
+        expires = datetime.fromisoformat(expires_at.removesuffix("Z") if "+" in expires_at else expires_at)
+    except ValueError:
+        return 0.0
+    if expires.tzinfo is None:
+        expires = expires.replace(tzinfo=timezone.utc)
+    return (expires - datetime.now(timezone.utc)).total_seconds()
+
+# Сбросить результат интроспекции токена (например, после выхода)
+def invalidate_token(access_token: str) -> bool:
+    return token_cache.invalidate(token_cache_key(access_token))
+
+# Сбросить кэш больниц/врачей: одну запись (kind и key) или целиком. Возвращает число сброшенных записей
+def invalidate_lookups(kind: Optional[str] = None, key: Optional[int] = None) -> int:
+    caches = [lookup_caches[kind]] if kind else lookup_caches.values()
+    if key is not None:
+        return sum(cache.invalidate(key) for cache in caches)
+    return sum(cache.clear() for cache in caches)
+
+def lookup_cache_stats() -> dict:
+    return {kind: cache.stats() for kind, cache in lookup_caches.items()}
 
 # получить_токен_доступа
 async def get_access_token(request: Request, access_token: str = Security(bearer_scheme)):
@@ -36,58 +93,190 @@ async def verify_user_token(
         raise credentials_exception
     
     access_token = token.credentials 
+    cache_key = token_cache_key(access_token)
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{ACCOUNT_SERVICE_URL}/api/Authentication/Validate",
-                params={"accessToken": access_token},
-                follow_redirects=True  
-            )
-            response.raise_for_status()  
-            return response.json() 
-        except httpx.HTTPStatusError:
+    token_info = token_cache.get(cache_key, None)
+    if token_info is not None:
+        return token_info
+
+    try:
+        claims = await decode_token_locally(access_token)
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Недействительный или просроченный токен")
+
+    if claims is not None:
+        if await is_token_revoked(access_token):
             raise HTTPException(status_code=401, detail="Недействительный или просроченный токен")
-        except Exception:
-            raise HTTPException(status_code=500, detail="Ошибка при проверке токена")
+        token_info = token_info_from_claims(claims)
+    else:
+        token_info = await introspect_token(access_token)
+
+    token_cache.set(cache_key, token_info, ttl=token_ttl(token_info))
+    return token_info
 
-# Получить информацию о докторе
+# Интроспекция токена в микросервисе аккаунтов
+async def introspect_token(access_token: str) -> dict:
+    try:
+        response = await http_client.get(
+            f"{ACCOUNT_SERVICE_URL}/api/Authentication/Validate",
+            params={"accessToken": access_token}
+        )
+        response.raise_for_status()  
+        return response.json() 
+    except httpx.HTTPStatusError:
+        raise HTTPException(status_code=401, detail="Недействительный или просроченный токен")
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail="Сервис аккаунтов временно недоступен")
+    except Exception:
+        raise HTTPException(status_code=500, detail="Ошибка при проверке токена")
+
+# Проверка отзыва токена, подпись которого уже проверена локально
+async def is_token_revoked(access_token: str) -> bool:
+    try:
+        response = await http_client.get(
+            f"{ACCOUNT_SERVICE_URL}/api/Authentication/Revoked",
+            params={"accessToken": access_token}
+        )
+        response.raise_for_status()
+        return response.json().get("revoked", True)
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail="Сервис аккаунтов временно недоступен")
+    except Exception:
+        raise HTTPException(status_code=500, detail="Ошибка при проверке токена")
+
+# Получить информацию о докторе (через кэш; одновременные запросы одного ID объединяются)
 async def get_doctor_by_id(doctor_id: int, request: Request, access_token: str = Security(bearer_scheme)) -> dict:
     access_token = await get_access_token(request, access_token)
     headers = {"Authorization": f"Bearer {access_token}"}
-    async with httpx.AsyncClient() as client:
+
+    async def load():
         try:
-            response = await client.get(
+            response = await http_client.get(
                 f"{ACCOUNT_SERVICE_URL}/api/Doctors/{doctor_id}",
-                headers=headers,
-                follow_redirects=True
+                headers=headers
             )
             response.raise_for_status() 
             return response.json() 
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 404:
-                raise HTTPException(status_code=404, detail="Доктор не найден")
-            else:
-                raise HTTPException(status_code=e.response.status_code, detail="Ошибка доступа к службе доктора или недействительный ID доктора")
+                return None
+            raise HTTPException(status_code=e.response.status_code, detail="Ошибка доступа к службе доктора или недействительный ID доктора")
         except Exception:
             raise HTTPException(status_code=500, detail="Ошибка при запросе к службе доктора")
 
-# Получите информацию о больнице с проверкой токена
+    doctor = await doctor_cache.get_or_load(doctor_id, load)
+    if doctor is None:
+        raise HTTPException(status_code=404, detail="Доктор не найден")
+    return doctor
+
+# Есть ли ID в кэше (найденный объект добавляется в found, ненайденный пропускается)
+def _cached(cache: LookupCache, key: int, found: dict) -> bool:
+    value = cache.lookup(key)
+    if value is MISSING:
+        return False
+    if value is not None:
+        found[key] = value
+    return True
+
+# Получить информацию о нескольких докторах: {id: доктор}, ненайденных ID в результате нет
+async def get_doctors_by_ids(doctor_ids: Iterable[int], request: Request, access_token: str = Security(bearer_scheme)) -> Dict[int, dict]:
+    access_token = await get_access_token(request, access_token)
+    headers = {"Authorization": f"Bearer {access_token}"}
+    found = {}
+    doctor_ids = [doctor_id for doctor_id in dict.fromkeys(doctor_ids) if not _cached(doctor_cache, doctor_id, found)]
+    if not doctor_ids:
+        return found
+
+    async def fetch(chunk):
+        response = await http_client.get(
+            f"{ACCOUNT_SERVICE_URL}/api/Doctors/Batch",
+            params={"ids": chunk},
+            headers=headers
+        )
+        response.raise_for_status()
+        return response.json()["doctors"]
+
+    try:
+        chunks = [doctor_ids[i:i + DOCTORS_BATCH_SIZE] for i in range(0, len(doctor_ids), DOCTORS_BATCH_SIZE)]
+        results = await asyncio.gather(*(fetch(chunk) for chunk in chunks))
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail="Ошибка доступа к службе доктора")
+    except Exception:
+        raise HTTPException(status_code=500, detail="Ошибка при запросе к службе доктора")
+
+    fetched = {doctor["id"]: doctor for doctors in results for doctor in doctors}
+    for doctor_id in doctor_ids:
+        doctor_cache.store(doctor_id, fetched.get(doctor_id))
+    return {**found, **fetched}
+
+# Получите информацию о больнице с проверкой токена (через кэш, как для докторов)
 async def get_hospital_by_id(hospital_id: int, request: Request, access_token: str = Security(bearer_scheme)):
     access_token = await get_access_token(request, access_token)
     headers = {"Authorization": f"Bearer {access_token}"}
-    
-    async with httpx.AsyncClient() as client:
+
+    async def load():
         try:
-            response = await client.get(
+            response = await http_client.get(
                 f"{HOSPITAL_SERVICE_URL}/api/Hospitals/{hospital_id}", 
-                headers=headers, 
-                follow_redirects=True  
+                headers=headers
             )
             response.raise_for_status() 
             return response.json()
-        except httpx.HTTPStatusError:
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return None
             raise HTTPException(status_code=401, detail="Ошибка доступа к службе больницы или недействительный ID больницы")
         except Exception:
             raise HTTPException(status_code=500, detail="Ошибка при запросе к службе больницы")
 
+    hospital = await hospital_cache.get_or_load(hospital_id, load)
+    if hospital is None:
+        raise HTTPException(status_code=401, detail="Ошибка доступа к службе больницы или недействительный ID больницы")
+    return hospital
+
+# Получить информацию о нескольких больницах одним запросом: {id: больница}
+async def get_hospitals_by_ids(hospital_ids: Iterable[int], request: Request, access_token: str = Security(bearer_scheme)) -> Dict[int, dict]:
+    access_token = await get_access_token(request, access_token)
+    found = {}
+    hospital_ids = [hospital_id for hospital_id in dict.fromkeys(hospital_ids) if not _cached(hospital_cache, hospital_id, found)]
+    if not hospital_ids:
+        return found
+    try:
+        response = await http_client.post(
+            f"{HOSPITAL_SERVICE_URL}/api/Hospitals/Batch",
+            json={"ids": hospital_ids},
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail="Ошибка доступа к службе больницы")
+    except Exception:
+        raise HTTPException(status_code=500, detail="Ошибка при запросе к службе больницы")
+    fetched = {hospital["id"]: hospital for hospital in response.json()["hospitals"]}
+    for hospital_id in hospital_ids:
+        hospital_cache.store(hospital_id, fetched.get(hospital_id))
+    return {**found, **fetched}
+
+# Проверить пары (больница, кабинет) одним запросом; результаты в порядке пар
+async def validate_rooms(pairs: List[Tuple[int, str]], request: Request, access_token: str = Security(bearer_scheme)) -> List[dict]:
+    access_token = await get_access_token(request, access_token)
+    if not pairs:
+        return []
+    try:
+        response = await http_client.post(
+            f"{HOSPITAL_SERVICE_URL}/api/Hospitals/ValidateRooms",
+            json={"items": [{"hospital_id": hospital_id, "room": room} for hospital_id, room in pairs]},
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail="Ошибка доступа к службе больницы")
+    except Exception:
+        raise HTTPException(status_code=500, detail="Ошибка при запросе к службе больницы")
+    return response.json()["results"]
+
+# проверить_администратора
+async def verify_admin_user(token: str = Depends(verify_user_token)):
+    if "Admin" not in token.get("roles", []):
+        raise HTTPException(status_code=403, detail="Не авторизован, только администраторы")
+    return token
@@ -1,18 +1,33 @@
 import json
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from typing import List
-from app.schemas.hospitals import HospitalCreate, HospitalUpdate, HospitalResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.schemas.hospitals import (
+    HospitalBatchRequest,
+    HospitalBatchResponse,
+    HospitalCreate,
+    HospitalResponse,
+    HospitalUpdate,
+    RoomCreate,
+    ValidateRoomsRequest,
+    ValidateRoomsResponse,
+)
 from app.services.hospitals import (
     get_hospitals,
-    get_hospital_by_id,
+    get_hospitals_by_ids,
+    get_hospitals_with_room,
+    hospital_has_room,
+    add_room,
+    delete_room,
+    validate_rooms,
     create_hospital,
     update_hospital,
     delete_hospital,
-    get_rooms_by_hospital_id
 )
 from app.db.session import get_db
+from app.services.directory import find_hospital_with_etag, not_modified
+from app.pagination import decode_cursor, set_next_cursor
 from app.utils import verify_user_token, verify_admin_user
 
 with open("app/docs/api_docs.json", "r", encoding="utf-8") as f:
@@ -26,12 +41,52 @@ router = APIRouter()
             description=api_docs["read_hospitals"]["description"])
 @router.get("/", include_in_schema=False, response_model=List[HospitalResponse], status_code=200)
 async def read_hospitals(
+    response: Response,
     from_: int = Query(0, ge=0, description="Начало выборки"),
     count: int = Query(10, ge=1, description="Размер выборки"),
-    db: Session = Depends(get_db), 
+    after: Optional[str] = Query(None, description="Курсор следующей страницы (заголовок X-Next-Cursor)"),
+    db: AsyncSession = Depends(get_db), 
+    user: dict = Depends(verify_user_token)
+):
+    hospitals = await get_hospitals(db, from_=from_, count=count, after=decode_cursor(after))
+    set_next_cursor(response, hospitals, count)
+    return hospitals
+
+# Получить несколько больниц по ID
+@router.post("/Batch", response_model=HospitalBatchResponse, status_code=200,
+             summary=api_docs["get_hospitals_batch"]["summary"],
+             description=api_docs["get_hospitals_batch"]["description"])
+@router.post("/Batch/", include_in_schema=False, response_model=HospitalBatchResponse, status_code=200)
+async def get_hospitals_batch(
+    request: HospitalBatchRequest,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(verify_user_token)
+):
+    return await get_hospitals_by_ids(db, request.ids)
+
+# Проверка кабинетов в больницах
+@router.post("/ValidateRooms", response_model=ValidateRoomsResponse, status_code=200,
+             summary=api_docs["validate_rooms"]["summary"],
+             description=api_docs["validate_rooms"]["description"])
+@router.post("/ValidateRooms/", include_in_schema=False, response_model=ValidateRoomsResponse, status_code=200)
+async def validate_hospital_rooms(
+    request: ValidateRoomsRequest,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(verify_user_token)
+):
+    return await validate_rooms(db, request.items)
+
+# Больницы, в которых есть кабинет
+@router.get("/WithRoom", response_model=List[HospitalResponse], status_code=200,
+            summary=api_docs["get_hospitals_with_room"]["summary"],
+            description=api_docs["get_hospitals_with_room"]["description"])
+@router.get("/WithRoom/", include_in_schema=False, response_model=List[HospitalResponse], status_code=200)
+async def read_hospitals_with_room(
+    room: str = Query(..., min_length=1, description="Название кабинета"),
+    db: AsyncSession = Depends(get_db),
     user: dict = Depends(verify_user_token)
 ):
-    return get_hospitals(db, from_=from_, count=count)
+    return await get_hospitals_with_room(db, room)
 
 # Получить больницу по ID
 @router.get("/{id}", response_model=HospitalResponse, status_code=200,
@@ -40,13 +95,15 @@ async def read_hospitals(
 @router.get("/{id}/", include_in_schema=False, response_model=HospitalResponse, status_code=200)
 async def get_hospital(
     id: int, 
-    db: Session = Depends(get_db), 
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db), 
     user: dict = Depends(verify_user_token)
 ):
-    hospital = get_hospital_by_id(db, hospital_id=id)
+    hospital, etag = await find_hospital_with_etag(db, hospital_id=id)
     if hospital is None:
         raise HTTPException(status_code=404, detail="Больница не найдена")
-    return hospital
+    return not_modified(if_none_match, response, etag) or hospital
 
 # Получение списка кабинетов больницы по ID
 @router.get("/{id}/Rooms", response_model=List[str], status_code=200,
@@ -55,13 +112,58 @@ async def get_hospital(
 @router.get("/{id}/Rooms/", include_in_schema=False, response_model=List[str], status_code=200)
 async def get_hospital_rooms(
     id: int, 
-    db: Session = Depends(get_db), 
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db), 
     user: dict = Depends(verify_user_token)
 ):
-    rooms = get_rooms_by_hospital_id(db=db, hospital_id=id)
-    if rooms is None:
+    hospital, etag = await find_hospital_with_etag(db, hospital_id=id)
+    if hospital is None:
         raise HTTPException(status_code=404, detail="Больница не найдена")
-    return rooms
+    return not_modified(if_none_match, response, etag) or hospital["rooms"]
+
+# Проверить наличие кабинета в больнице
+@router.get("/{id}/Rooms/{room}", status_code=200,
+            summary=api_docs["check_hospital_room"]["summary"],
+            description=api_docs["check_hospital_room"]["description"])
+@router.get("/{id}/Rooms/{room}/", include_in_schema=False, status_code=200)
+async def check_hospital_room(
+    id: int,
+    room: str,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(verify_user_token)
+):
+    if not await hospital_has_room(db, hospital_id=id, room=room):
+        raise HTTPException(status_code=404, detail="Кабинет не найден")
+    return JSONResponse(content={"message": "Кабинет существует"})
+
+# Добавить кабинет в больницу
+@router.post("/{id}/Rooms", status_code=201,
+             summary=api_docs["add_hospital_room"]["summary"],
+             description=api_docs["add_hospital_room"]["description"])
+@router.post("/{id}/Rooms/", include_in_schema=False, status_code=201)
+async def add_hospital_room(
+    id: int,
+    room: RoomCreate,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(verify_admin_user)
+):
+    await add_room(db, hospital_id=id, room=room.name)
+    return JSONResponse(status_code=201, content={"message": "Кабинет успешно добавлен"})
+
+# Удалить кабинет из больницы
+@router.delete("/{id}/Rooms/{room}", status_code=200,
+               summary=api_docs["delete_hospital_room"]["summary"],
+               description=api_docs["delete_hospital_room"]["description"])
+@router.delete("/{id}/Rooms/{room}/", include_in_schema=False, status_code=200)
+async def delete_hospital_room(
+    id: int,
+    room: str,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(verify_admin_user)
+):
+    await delete_room(db, hospital_id=id, room=room)
+    return JSONResponse(content={"message": "Кабинет успешно удалён"})
 
 # Создание записи о новой больнице
 @router.post("", status_code=201,
@@ -70,10 +172,10 @@ async def get_hospital_rooms(
 @router.post("/", include_in_schema=False, status_code=201)
 async def create_new_hospital(
     hospital: HospitalCreate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     user: dict = Depends(verify_admin_user)
 ):
-    create_hospital(db=db, hospital=hospital)
+    await create_hospital(db=db, hospital=hospital)
     return JSONResponse(content={"message": "Больница успешно создана"})
 
 # Изменение информации о больнице по ID
@@ -84,10 +186,10 @@ async def create_new_hospital(
 async def update_existing_hospital(
     id: int, 
     hospital: HospitalUpdate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     user: dict = Depends(verify_admin_user)
 ):
-    updated_hospital = update_hospital(db, hospital_id=id, hospital=hospital)
+    updated_hospital = await update_hospital(db, hospital_id=id, hospital=hospital)
     if updated_hospital is None:
         raise HTTPException(status_code=404, detail="Больница не найдена")
     return JSONResponse(content={"message": "Больница успешно обновлена"})
@@ -99,10 +201,10 @@ async def update_existing_hospital(
 @router.delete("/{id}/", include_in_schema=False, status_code=200)
 async def delete_existing_hospital(
     id: int, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     user: dict = Depends(verify_admin_user)
 ):
-    deleted_hospital = delete_hospital(db, hospital_id=id)
+    deleted_hospital = await delete_hospital(db, hospital_id=id)
     if deleted_hospital is None:
         raise HTTPException(status_code=404, detail="Больница не найдена")
     return JSONResponse(content={"message": "Больница успешно удалена"})  
\ No newline at end of file
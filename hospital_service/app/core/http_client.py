@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Optional
+import httpx
+from app.core.config import settings
+from app.core.resilience import CLOSED, CircuitOpenError, TargetPolicy
+
+logger = logging.getLogger(__name__)
+
+# Ответы, после которых идемпотентный запрос можно повторить
+RETRYABLE_STATUSES = {502, 503, 504}
+
+
+# HTTP/2 доступен только при установленном пакете h2
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Общий HTTP-клиент процесса для запросов к другим микросервисам.
+# Создаётся один раз в lifespan и переиспользует соединения (keep-alive).
+# Для каждого сервиса (host:port) ведутся выключатель, бюджет повторов и задержки
+# ответов: при сбое запросы отклоняются сразу, а не ждут таймаута.
+class ServiceHttpClient:
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._targets: Dict[str, TargetPolicy] = {}
+        self.http2 = False
+        self.requests = 0
+        self.in_flight = 0
+        self.connections_opened = 0
+
+    async def start(self):
+        if self._client is not None:
+            return
+
+        self.http2 = settings.HTTP2
+        if self.http2 and not http2_available():
+            logger.warning("HTTP2 включён, но пакет h2 не установлен: используется HTTP/1.1")
+            self.http2 = False
+
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+            http2=self.http2,
+            follow_redirects=True,
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("HTTP-клиент не инициализирован")
+        return self._client
+
+    def _target(self, url: str) -> TargetPolicy:
+        key = httpx.URL(url).netloc.decode("ascii")
+        target = self._targets.get(key)
+        if target is None:
+            target = self._targets[key] = TargetPolicy()
+        return target
+
+    # Повторяются только идемпотентные запросы (GET или idempotent=True) после сетевой
+    # ошибки или ответа 502/503/504, не больше HTTP_MAX_RETRIES раз и в пределах бюджета.
+    # Таймаут не повторяется: медленные ответы покрывает дублирование GET, если ответа
+    # нет дольше p95 (HTTP_HEDGE_ENABLED). Все попытки вместе ограничены HTTP_REQUEST_DEADLINE.
+    async def request(
+        self, method: str, url: str, timeout: Optional[float] = None, idempotent: Optional[bool] = None, **kwargs
+    ) -> httpx.Response:
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        if idempotent is None:
+            idempotent = method == "GET"
+
+        target = self._target(url)
+        target.budget.deposit()
+        try:
+            async with asyncio.timeout(settings.HTTP_REQUEST_DEADLINE):
+                return await self._request_with_retries(target, method, url, idempotent, kwargs)
+        except TimeoutError:
+            target.deadline_exceeded += 1
+            raise httpx.TimeoutException(f"Превышено общее время запроса к {httpx.URL(url).host}")
+
+    async def _request_with_retries(
+        self, target: TargetPolicy, method: str, url: str, idempotent: bool, kwargs: dict
+    ) -> httpx.Response:
+        attempt = 0
+        while True:
+            if not target.breaker.allow():
+                raise CircuitOpenError(f"Сервис {httpx.URL(url).host} временно недоступен")
+            try:
+                if method == "GET" and idempotent:
+                    response = await self._send_hedged(target, method, url, kwargs)
+                else:
+                    response = await self._send(target, method, url, kwargs)
+            except httpx.TimeoutException:
+                raise
+            except httpx.TransportError:
+                if not self._can_retry(target, idempotent, attempt):
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUSES or not self._can_retry(target, idempotent, attempt):
+                    return response
+
+            attempt += 1
+            target.retries += 1
+            await asyncio.sleep(settings.HTTP_RETRY_BACKOFF * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+    def _can_retry(self, target: TargetPolicy, idempotent: bool, attempt: int) -> bool:
+        return idempotent and attempt < settings.HTTP_MAX_RETRIES and target.budget.try_spend()
+
+    async def _send(self, target: TargetPolicy, method: str, url: str, kwargs: dict) -> httpx.Response:
+        self.requests += 1
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, extensions={"trace": self._trace}, **kwargs)
+        except httpx.TransportError:
+            target.breaker.record_failure()
+            raise
+        except asyncio.CancelledError:
+            target.breaker.release()
+            raise
+        finally:
+            self.in_flight -= 1
+
+        if response.status_code >= 500:
+            target.breaker.record_failure()
+        else:
+            target.breaker.record_success()
+            target.latency.add(time.perf_counter() - started)
+        return response
+
+    # Если первый запрос не ответил за p95, отправляется второй; берётся первый успешный
+    # ответ, оставшийся запрос отменяется
+    async def _send_hedged(self, target: TargetPolicy, method: str, url: str, kwargs: dict) -> httpx.Response:
+        delay = target.hedge_delay()
+        primary = asyncio.ensure_future(self._send(target, method, url, kwargs))
+        if delay is None:
+            return await primary
+
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and target.breaker.state == CLOSED and target.budget.try_spend():
+                target.hedges += 1
+                tasks.append(asyncio.ensure_future(self._send(target, method, url, kwargs)))
+
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            target.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    # Каждое новое TCP-соединение фиксируется через trace-хуки httpcore
+    async def _trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+
+    def stats(self) -> dict:
+        reused = max(self.requests - self.connections_opened, 0)
+        return {
+            "http2": self.http2,
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "connections_opened": self.connections_opened,
+            "connection_reuse_rate": round(reused / self.requests, 4) if self.requests else 0.0,
+            "max_connections": settings.HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            "targets": {key: target.stats() for key, target in self._targets.items()},
+        }
+
+
+http_client = ServiceHttpClient()
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import sys
+from typing import Awaitable, Callable, List, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Ключ pg_advisory_xact_lock: миграции применяет только один процесс, остальные ждут
+MIGRATIONS_LOCK_KEY = 72320001
+
+# Таблица применённых миграций - своя у каждого сервиса: в docker-compose все сервисы
+# работают в одной БД. Миграции идемпотентны, поэтому при переходе со старой общей
+# таблицы schema_migrations они просто применяются повторно.
+MIGRATIONS_TABLE = "hospital_schema_migrations"
+
+Migration = Tuple[int, str, Callable[[AsyncConnection], Awaitable[None]]]
+
+
+async def _execute(conn: AsyncConnection, *statements: str):
+    for statement in statements:
+        await conn.execute(text(statement))
+
+
+# 1. Исходная схема (совпадает с тем, что создавал create_all, поэтому безопасна для существующих БД)
+async def initial_schema(conn: AsyncConnection):
+    await _execute(
+        conn,
+        """CREATE TABLE IF NOT EXISTS hospitals (
+            id SERIAL NOT NULL PRIMARY KEY,
+            name VARCHAR,
+            address VARCHAR,
+            "contactPhone" VARCHAR,
+            rooms VARCHAR[] NOT NULL DEFAULT '{}',
+            is_active BOOLEAN
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_hospitals_id ON hospitals (id)",
+        "CREATE INDEX IF NOT EXISTS ix_hospitals_name ON hospitals (name)",
+        "CREATE SEQUENCE IF NOT EXISTS hospital_directory_version",
+    )
+
+
+# 2. Кабинеты - отдельная таблица с уникальным индексом (hospital_id, name) вместо массива.
+# Порядок кабинетов сохраняется в position, дубликаты внутри массива отбрасываются.
+# Массив переносится и удаляется, только если он ещё есть (повторный запуск ничего не делает).
+async def hospital_rooms(conn: AsyncConnection):
+    await _execute(
+        conn,
+        """CREATE TABLE IF NOT EXISTS hospital_rooms (
+            id SERIAL NOT NULL PRIMARY KEY,
+            hospital_id INTEGER NOT NULL REFERENCES hospitals (id) ON DELETE CASCADE,
+            name VARCHAR NOT NULL,
+            position INTEGER NOT NULL DEFAULT 0
+        )""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_hospital_rooms_hospital_id_name ON hospital_rooms (hospital_id, name)",
+        "CREATE INDEX IF NOT EXISTS ix_hospital_rooms_name ON hospital_rooms (name)",
+    )
+    rooms_column = await conn.scalar(text(
+        "SELECT count(*) FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = 'hospitals' AND column_name = 'rooms'"
+    ))
+    if not rooms_column:
+        return
+    await _execute(
+        conn,
+        """INSERT INTO hospital_rooms (hospital_id, name, position)
+            SELECT h.id, r.name, r.ord - 1
+            FROM hospitals h, unnest(h.rooms) WITH ORDINALITY AS r(name, ord)
+            WHERE r.name IS NOT NULL
+            ORDER BY h.id, r.ord
+            ON CONFLICT (hospital_id, name) DO NOTHING""",
+        "ALTER TABLE hospitals DROP COLUMN rooms",
+    )
+
+
+MIGRATIONS: List[Migration] = [
+    (1, "initial_schema", initial_schema),
+    (2, "hospital_rooms", hospital_rooms),
+]
+
+
+# Применить недостающие миграции в одной транзакции. Возвращает номера применённых
+async def run_migrations(engine: AsyncEngine) -> List[int]:
+    applied_now = []
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+        await _execute(
+            conn,
+            f"""CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR NOT NULL,
+                applied_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+            )""",
+        )
+        applied = set(await conn.scalars(text(f"SELECT version FROM {MIGRATIONS_TABLE}")))
+
+        for version, name, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            logger.info("Применение миграции %s_%s", version, name)
+            await migrate(conn)
+            await conn.execute(
+                text(f"INSERT INTO {MIGRATIONS_TABLE} (version, name) VALUES (:version, :name)"),
+                {"version": version, "name": name},
+            )
+            applied_now.append(version)
+    return applied_now
+
+
+# Применение миграций вне запуска сервиса: python -m app.db.migrations
+if __name__ == "__main__":
+    from app.db.database import engine
+
+    async def main():
+        applied = await run_migrations(engine)
+        await engine.dispose()
+        print(f"Применены миграции: {applied}" if applied else "Схема БД актуальна")
+
+    if sys.argv[1:]:
+        sys.exit("Использование: python -m app.db.migrations")
+    asyncio.run(main())
@@ -1,7 +1,30 @@
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, Security
 from app.api.routes import hospitals
 from fastapi.middleware.cors import CORSMiddleware
-from app.db.database import Base, engine
+from contextlib import asynccontextmanager
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core.http_client import http_client
+from app.core.config import settings
+from app.db.database import SessionLocal, engine
+from app.db.migrations import run_migrations
+from app.services.directory import hospital_directory, run_directory_refresh
+from app.utils import bearer_scheme, invalidate_token, token_cache
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.MIGRATE_ON_STARTUP:
+        await run_migrations(engine)
+    await http_client.start()
+    async with SessionLocal() as db:
+        await hospital_directory.load(db)
+    directory_refresh = asyncio.create_task(run_directory_refresh(SessionLocal))
+
+    yield
+
+    directory_refresh.cancel()
+    await http_client.close()
+    await engine.dispose()
 
 app = FastAPI(
     title="МИКРОСЕРВИС БОЛЬНИЦ",
@@ -9,8 +32,8 @@ app = FastAPI(
                     подключенных к системе. Отправляет запросы в микросервис
                     аккаунтов для интроспекции токена.""",
     version="1.0.0",
+    lifespan=lifespan,
 )
-Base.metadata.create_all(bind=engine)
 
 
 app.add_middleware(
@@ -27,3 +50,16 @@ app.include_router(hospitals.router, prefix="/api/Hospitals", tags=["Hospitals"]
 def read_root():
     return {"message": "Hospital Service"}
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return {
+        "http_client": http_client.stats(),
+        "token_cache": token_cache.stats(),
+        "hospital_directory": hospital_directory.stats(),
+    }
+
+# Немедленный сброс закэшированной проверки токена в этом воркере (без него запись истекает через TOKEN_CACHE_TTL)
+@app.post("/TokenCache/Invalidate", include_in_schema=False)
+def invalidate_token_cache(token: HTTPAuthorizationCredentials = Security(bearer_scheme)):
+    invalidate_token(token.credentials)
+    return {"message": "Кэш токена сброшен"}
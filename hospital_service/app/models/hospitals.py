@@ -1,4 +1,8 @@
-from sqlalchemy import ARRAY, Boolean, Column, Integer, String
+from typing import List
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String
+from sqlalchemy.ext.associationproxy import association_proxy
+from sqlalchemy.ext.orderinglist import ordering_list
+from sqlalchemy.orm import relationship
 from app.db.database import Base  
 
 class Hospital(Base):
@@ -8,11 +12,40 @@ class Hospital(Base):
     name = Column(String, index=True)
     address = Column(String)
     contactPhone = Column(String)
-    rooms = Column(ARRAY(String), nullable=False, default=[])  
     is_active = Column(Boolean, default=True)
 
+    room_rows = relationship(
+        "HospitalRoom",
+        order_by="HospitalRoom.position",
+        collection_class=ordering_list("position"),
+        cascade="all, delete-orphan",
+        lazy="selectin",
+    )
+    # Список названий кабинетов (как раньше со столбцом-массивом)
+    rooms = association_proxy("room_rows", "name", creator=lambda name: HospitalRoom(name=name))
+
     def __repr__(self):
-        return f"<Hospital(id={self.id}, name={self.name}, rooms={self.rooms})>"
+        return f"<Hospital(id={self.id}, name={self.name}, rooms={list(self.rooms)})>"
 
     def has_room(self, room: str) -> bool:
-        return room in self.rooms
\ No newline at end of file
+        return room in self.rooms
+
+    # Заменить список кабинетов: существующие строки сохраняются, удаляются только
+    # исчезнувшие кабинеты (пересоздание всех строк нарушило бы уникальный индекс)
+    def set_rooms(self, rooms: List[str]):
+        existing = {row.name: row for row in self.room_rows}
+        self.room_rows = [existing.get(name) or HospitalRoom(name=name) for name in dict.fromkeys(rooms)]
+        self.room_rows.reorder()
+
+
+class HospitalRoom(Base):
+    __tablename__ = "hospital_rooms"
+
+    id = Column(Integer, primary_key=True)
+    hospital_id = Column(Integer, ForeignKey("hospitals.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String, nullable=False, index=True)
+    position = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ux_hospital_rooms_hospital_id_name", "hospital_id", "name", unique=True),
+    )
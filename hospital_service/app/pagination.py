@@ -0,0 +1,31 @@
+import base64
+import binascii
+import json
+from typing import Optional, Sequence
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+# Курсор keyset-пагинации: непрозрачная строка с ID последней записи страницы
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if cursor is None:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))["id"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Недействительный курсор пагинации")
+    if not isinstance(last_id, int):
+        raise HTTPException(status_code=400, detail="Недействительный курсор пагинации")
+    return last_id
+
+
+# Если страница заполнена, в заголовке X-Next-Cursor передаётся курсор следующей
+def set_next_cursor(response: Response, items: Sequence, count: int):
+    if items and len(items) == count:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(items[-1].id)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List
 
 class HospitalBase(BaseModel):
@@ -22,3 +22,29 @@ class HospitalResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class RoomCreate(BaseModel):
+    name: str = Field(..., min_length=1)
+
+
+class HospitalBatchRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+class HospitalBatchResponse(BaseModel):
+    hospitals: List[HospitalResponse]
+    missing: List[int]
+
+class RoomCheck(BaseModel):
+    hospital_id: int
+    room: str
+
+class ValidateRoomsRequest(BaseModel):
+    items: List[RoomCheck] = Field(..., min_length=1, max_length=1000)
+
+class RoomCheckResult(RoomCheck):
+    hospital_exists: bool
+    valid: bool
+
+class ValidateRoomsResponse(BaseModel):
+    results: List[RoomCheckResult]
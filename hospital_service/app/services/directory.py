@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from fastapi import Response
+from sqlalchemy import Sequence, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.core.config import settings
+from app.db.database import Base
+from app.models.hospitals import Hospital
+
+logger = logging.getLogger(__name__)
+
+# Версия справочника больниц. Увеличивается после каждой зафиксированной записи,
+# поэтому воркер, увидевший новую версию, гарантированно прочитает изменения.
+directory_version_seq = Sequence("hospital_directory_version", metadata=Base.metadata)
+
+
+class HospitalEntry:
+    __slots__ = ("data", "rooms")
+
+    def __init__(self, hospital: Hospital):
+        self.data = {
+            "id": hospital.id,
+            "name": hospital.name,
+            "address": hospital.address,
+            "contactPhone": hospital.contactPhone,
+            "rooms": list(hospital.rooms),
+        }
+        self.rooms: FrozenSet[str] = frozenset(hospital.rooms)
+
+
+# Снимок активных больниц в памяти процесса: поиск по id и проверка кабинета за O(1).
+# Перечитывается, когда версия в БД меняется (фоновая проверка раз в
+# HOSPITAL_DIRECTORY_POLL_INTERVAL секунд). После записи в этом воркере обновляется
+# только изменённая больница.
+class HospitalDirectory:
+    def __init__(self):
+        self._entries: Dict[int, HospitalEntry] = {}
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.updates = 0
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+    async def load(self, db: AsyncSession):
+        version = await current_version(db)
+        hospitals = await db.scalars(select(Hospital).filter(Hospital.is_active == True))
+        self._entries = {hospital.id: HospitalEntry(hospital) for hospital in hospitals}
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.reloads += 1
+
+    # Обновить одну больницу после записи этого воркера, получившей версию version.
+    # Если снимок отстаёт больше чем на одну версию (были записи других воркеров),
+    # он перечитывается целиком
+    async def apply_change(self, db: AsyncSession, hospital_id: int, version: int):
+        if version != self.version + 1:
+            await self.load(db)
+            return
+        hospital = await db.scalar(
+            select(Hospital)
+            .filter(Hospital.id == hospital_id, Hospital.is_active == True)
+            .execution_options(populate_existing=True)
+        )
+        if version != self.version + 1:
+            return
+        if hospital is None:
+            self._entries.pop(hospital_id, None)
+        else:
+            self._entries[hospital_id] = HospitalEntry(hospital)
+        self.version = version
+        self.updates += 1
+
+    async def refresh(self, db: AsyncSession):
+        stale = self.loaded_at is None or time.monotonic() - self.loaded_at > settings.HOSPITAL_DIRECTORY_MAX_AGE
+        if stale or await current_version(db) != self.version:
+            await self.load(db)
+
+    def get(self, hospital_id: int) -> Optional[HospitalEntry]:
+        entry = self._entries.get(hospital_id)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "reloads": self.reloads,
+            "updates": self.updates,
+        }
+
+
+hospital_directory = HospitalDirectory()
+
+
+async def current_version(db: AsyncSession) -> int:
+    row = (await db.execute(text("SELECT last_value, is_called FROM hospital_directory_version"))).one()
+    return row.last_value if row.is_called else 0
+
+
+# Вызывается после commit: увеличить версию и обновить больницу в справочнике этого воркера
+async def publish_directory_change(db: AsyncSession, hospital_id: int):
+    version = await db.scalar(select(directory_version_seq.next_value()))
+    await db.commit()
+    await hospital_directory.apply_change(db, hospital_id, version)
+
+
+# Найти больницу: из снимка, а если её там нет (создана в другом воркере
+# после последней проверки версии) - в БД
+async def find_hospital(db: AsyncSession, hospital_id: int) -> Optional[dict]:
+    hospital, _ = await find_hospital_with_etag(db, hospital_id)
+    return hospital
+
+
+# То же вместе с ETag версии снимка, из которой взята больница. У ответа из БД
+# ETag нет: версия справочника не описывает данные, которых в снимке не было
+async def find_hospital_with_etag(db: AsyncSession, hospital_id: int) -> Tuple[Optional[dict], Optional[str]]:
+    entry = hospital_directory.get(hospital_id)
+    if entry is not None:
+        return entry.data, hospital_directory.etag
+    hospital = await db.scalar(select(Hospital).filter(Hospital.id == hospital_id, Hospital.is_active == True))
+    return (HospitalEntry(hospital).data if hospital else None), None
+
+
+# Найти несколько больниц: из снимка, недостающие - одним запросом к БД
+async def find_hospitals(db: AsyncSession, hospital_ids: List[int]) -> Dict[int, dict]:
+    found = {}
+    missing = []
+    for hospital_id in dict.fromkeys(hospital_ids):
+        entry = hospital_directory.get(hospital_id)
+        if entry is not None:
+            found[hospital_id] = entry.data
+        else:
+            missing.append(hospital_id)
+    if missing:
+        hospitals = await db.scalars(select(Hospital).filter(Hospital.id.in_(missing), Hospital.is_active == True))
+        for hospital in hospitals:
+            found[hospital.id] = HospitalEntry(hospital).data
+    return found
+
+
+# Условный GET: если клиент прислал ETag отданной версии, тело не передаётся.
+# Без etag (ответ не из снимка) заголовок не ставится и 304 не возвращается
+def not_modified(if_none_match: Optional[str], response: Response, etag: Optional[str]) -> Optional[Response]:
+    if etag is None:
+        return None
+    response.headers["ETag"] = etag
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+# Фоновая проверка версии справочника
+async def run_directory_refresh(session_factory: async_sessionmaker):
+    while True:
+        await asyncio.sleep(settings.HOSPITAL_DIRECTORY_POLL_INTERVAL)
+        try:
+            async with session_factory() as db:
+                await hospital_directory.refresh(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Ошибка обновления справочника больниц")
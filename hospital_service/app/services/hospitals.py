@@ -1,50 +1,146 @@
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
-from app.models.hospitals import Hospital
-from app.schemas.hospitals import HospitalCreate, HospitalUpdate
+from app.models.hospitals import Hospital, HospitalRoom
+from app.schemas.hospitals import HospitalCreate, HospitalUpdate, RoomCheck
+from app.services.directory import find_hospital, find_hospitals, hospital_directory, publish_directory_change
 
 # Получение списка больниц
-def get_hospitals(db: Session, from_: int = 0, count: int = 10):
-    return db.query(Hospital).filter(Hospital.is_active == True).offset(from_).limit(count).all()
+# after - ID последней больницы предыдущей страницы (keyset-пагинация), иначе from_/count
+async def get_hospitals(db: AsyncSession, from_: int = 0, count: int = 10, after: Optional[int] = None):
+    query = select(Hospital).filter(Hospital.is_active == True)
+    if after is not None:
+        query = query.filter(Hospital.id > after)
+    else:
+        query = query.offset(from_)
+    hospitals = await db.scalars(query.order_by(Hospital.id).limit(count))
+    return hospitals.all()
 
 # Получить больницу по ID
-def get_hospital_by_id(db: Session, hospital_id: int):
-    db_hospital = db.query(Hospital).filter(Hospital.id == hospital_id, Hospital.is_active == True).first()
+async def get_hospital_by_id(db: AsyncSession, hospital_id: int):
+    db_hospital = await db.scalar(select(Hospital).filter(Hospital.id == hospital_id, Hospital.is_active == True))
     if not db_hospital:
         raise HTTPException(status_code=404, detail="Больница не найдена")
     return db_hospital
 
 # Получение списка кабинетов больницы по Id
-def get_rooms_by_hospital_id(db: Session, hospital_id: int):
-    db_hospital = get_hospital_by_id(db, hospital_id)  
-    return db_hospital.rooms if db_hospital else None
+async def get_rooms_by_hospital_id(db: AsyncSession, hospital_id: int):
+    hospital = await find_hospital(db, hospital_id)
+    return hospital["rooms"] if hospital else None
+
+# Проверить, что больница существует, не загружая её кабинеты
+async def ensure_hospital_exists(db: AsyncSession, hospital_id: int):
+    if hospital_directory.get(hospital_id) is not None:
+        return
+    if not await db.scalar(select(exists().where(Hospital.id == hospital_id, Hospital.is_active == True))):
+        raise HTTPException(status_code=404, detail="Больница не найдена")
+
+# Есть ли кабинет в больнице: из справочника, иначе по уникальному индексу (hospital_id, name)
+async def hospital_has_room(db: AsyncSession, hospital_id: int, room: str) -> bool:
+    entry = hospital_directory.get(hospital_id)
+    if entry is not None:
+        return room in entry.rooms
+    await ensure_hospital_exists(db, hospital_id)
+    return bool(await db.scalar(
+        select(exists().where(HospitalRoom.hospital_id == hospital_id, HospitalRoom.name == room))
+    ))
+
+# Больницы, в которых есть кабинет с указанным названием (индекс по hospital_rooms.name)
+async def get_hospitals_with_room(db: AsyncSession, room: str):
+    hospitals = await db.scalars(
+        select(Hospital)
+        .join(HospitalRoom, HospitalRoom.hospital_id == Hospital.id)
+        .filter(HospitalRoom.name == room, Hospital.is_active == True)
+        .order_by(Hospital.id)
+    )
+    return hospitals.all()
+
+# Добавить кабинет, не перезаписывая больницу
+async def add_room(db: AsyncSession, hospital_id: int, room: str):
+    await ensure_hospital_exists(db, hospital_id)
+    position = await db.scalar(
+        select(func.coalesce(func.max(HospitalRoom.position) + 1, 0)).filter(HospitalRoom.hospital_id == hospital_id)
+    )
+    created = await db.scalar(
+        insert(HospitalRoom)
+        .values(hospital_id=hospital_id, name=room, position=position)
+        .on_conflict_do_nothing(index_elements=[HospitalRoom.hospital_id, HospitalRoom.name])
+        .returning(HospitalRoom.id)
+    )
+    if created is None:
+        raise HTTPException(status_code=400, detail="Кабинет уже существует")
+    await db.commit()
+    await publish_directory_change(db, hospital_id)
+
+# Удалить кабинет, не перезаписывая больницу
+async def delete_room(db: AsyncSession, hospital_id: int, room: str):
+    await ensure_hospital_exists(db, hospital_id)
+    result = await db.execute(
+        delete(HospitalRoom).filter(HospitalRoom.hospital_id == hospital_id, HospitalRoom.name == room)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Кабинет не найден")
+    await db.commit()
+    await publish_directory_change(db, hospital_id)
+
+# Получить несколько больниц по ID
+async def get_hospitals_by_ids(db: AsyncSession, hospital_ids: List[int]):
+    hospital_ids = list(dict.fromkeys(hospital_ids))
+    found = await find_hospitals(db, hospital_ids)
+    return {
+        "hospitals": [found[hospital_id] for hospital_id in hospital_ids if hospital_id in found],
+        "missing": [hospital_id for hospital_id in hospital_ids if hospital_id not in found],
+    }
+
+# Проверить пары (больница, кабинет)
+async def validate_rooms(db: AsyncSession, items: List[RoomCheck]):
+    found = await find_hospitals(db, [item.hospital_id for item in items])
+    results = []
+    for item in items:
+        hospital = found.get(item.hospital_id)
+        results.append({
+            "hospital_id": item.hospital_id,
+            "room": item.room,
+            "hospital_exists": hospital is not None,
+            "valid": hospital is not None and item.room in hospital["rooms"],
+        })
+    return {"results": results}
 
 # Создание записи о новой больнице
-def create_hospital(db: Session, hospital: HospitalCreate):
-    db_hospital = Hospital(**hospital.model_dump(exclude_unset=True))
+async def create_hospital(db: AsyncSession, hospital: HospitalCreate):
+    db_hospital = Hospital(**hospital.model_dump(exclude={"rooms"}))
+    db_hospital.set_rooms(hospital.rooms)
     db.add(db_hospital)
-    db.commit()
+    await db.commit()
+    await publish_directory_change(db, db_hospital.id)
     
 
 # Изменение информации о больнице по Id
-def update_hospital(db: Session, hospital_id: int, hospital: HospitalUpdate):
-    db_hospital = get_hospital_by_id(db, hospital_id)
+async def update_hospital(db: AsyncSession, hospital_id: int, hospital: HospitalUpdate):
+    db_hospital = await get_hospital_by_id(db, hospital_id)
     if not db_hospital:
         return None 
     for key, value in hospital.model_dump(exclude_unset=True).items():
-        setattr(db_hospital, key, value)
-    db.commit()
-    db.refresh(db_hospital) 
+        if key == "rooms":
+            db_hospital.set_rooms(value)
+        else:
+            setattr(db_hospital, key, value)
+    await db.commit()
+    await publish_directory_change(db, hospital_id)
+    await db.refresh(db_hospital) 
     return db_hospital
 
 
 # Мягкое удаление записи о больнице
-def delete_hospital(db: Session, hospital_id: int):
-    db_hospital = get_hospital_by_id(db, hospital_id)
+async def delete_hospital(db: AsyncSession, hospital_id: int):
+    db_hospital = await get_hospital_by_id(db, hospital_id)
     if db_hospital is not None:
        db_hospital.is_active = False  
-       db.commit() 
-       db.refresh(db_hospital)
+       await db.commit() 
+       await publish_directory_change(db, hospital_id)
+       await db.refresh(db_hospital)
                 
        return db_hospital
     return None 
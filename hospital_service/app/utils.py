@@ -1,11 +1,43 @@
 
+import hashlib
 import httpx
+from jose import JWTError
+from datetime import datetime, timezone
 from fastapi import Depends, HTTPException, Request, Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer, OAuth2PasswordBearer
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.http_client import http_client
+from app.core.resilience import CircuitOpenError
+from app.core.jwks import decode_token_locally, token_info_from_claims
 
 ACCOUNT_SERVICE_URL = settings.ACCOUNT_SERVICE_URL
 bearer_scheme = HTTPBearer() 
+# Результат проверки токена хранится не дольше TOKEN_CACHE_TTL (несколько секунд): токен,
+# с которым вышли, перестаёт приниматься каждым воркером не позже чем через это время,
+# без участия клиента
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.TOKEN_CACHE_TTL)
+
+# Ключ кэша интроспекции: хэш токена, сам токен в памяти не хранится
+def token_cache_key(access_token: str) -> str:
+    return hashlib.sha256(access_token.encode()).hexdigest()
+
+# Сколько секунд токен ещё действителен по ответу Validate
+def token_ttl(token_info: dict) -> float:
+    expires_at = token_info.get("expires_at")
+    if not expires_at:
+        return 0.0
+    try:
+        expires = datetime.fromisoformat(expires_at.removesuffix("Z") if "+" in expires_at else expires_at)
+    except ValueError:
+        return 0.0
+    if expires.tzinfo is None:
+        expires = expires.replace(tzinfo=timezone.utc)
+    return (expires - datetime.now(timezone.utc)).total_seconds()
+
+# Сбросить результат интроспекции токена (например, после выхода)
+def invalidate_token(access_token: str) -> bool:
+    return token_cache.invalidate(token_cache_key(access_token))
 
 async def verify_user_token(
     token: HTTPAuthorizationCredentials = Security(bearer_scheme)
@@ -20,20 +52,56 @@ async def verify_user_token(
         raise credentials_exception
     
     access_token = token.credentials 
+    cache_key = token_cache_key(access_token)
+
+    token_info = token_cache.get(cache_key, None)
+    if token_info is not None:
+        return token_info
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{ACCOUNT_SERVICE_URL}/api/Authentication/Validate",
-                params={"accessToken": access_token},
-                follow_redirects=True  
-            )
-            response.raise_for_status()  
-            return response.json() 
-        except httpx.HTTPStatusError:
+    try:
+        claims = await decode_token_locally(access_token)
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Недействительный или просроченный токен")
+
+    if claims is not None:
+        if await is_token_revoked(access_token):
             raise HTTPException(status_code=401, detail="Недействительный или просроченный токен")
-        except Exception:
-            raise HTTPException(status_code=500, detail="Ошибка при проверке токена")
+        token_info = token_info_from_claims(claims)
+    else:
+        token_info = await introspect_token(access_token)
+
+    token_cache.set(cache_key, token_info, ttl=token_ttl(token_info))
+    return token_info
+
+# Интроспекция токена в микросервисе аккаунтов
+async def introspect_token(access_token: str) -> dict:
+    try:
+        response = await http_client.get(
+            f"{ACCOUNT_SERVICE_URL}/api/Authentication/Validate",
+            params={"accessToken": access_token}
+        )
+        response.raise_for_status()  
+        return response.json() 
+    except httpx.HTTPStatusError:
+        raise HTTPException(status_code=401, detail="Недействительный или просроченный токен")
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail="Сервис аккаунтов временно недоступен")
+    except Exception:
+        raise HTTPException(status_code=500, detail="Ошибка при проверке токена")
+
+# Проверка отзыва токена, подпись которого уже проверена локально
+async def is_token_revoked(access_token: str) -> bool:
+    try:
+        response = await http_client.get(
+            f"{ACCOUNT_SERVICE_URL}/api/Authentication/Revoked",
+            params={"accessToken": access_token}
+        )
+        response.raise_for_status()
+        return response.json().get("revoked", True)
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail="Сервис аккаунтов временно недоступен")
+    except Exception:
+        raise HTTPException(status_code=500, detail="Ошибка при проверке токена")
 
 
 async def verify_admin_user(token: str = Depends(verify_user_token)):
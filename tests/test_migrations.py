@@ -0,0 +1,106 @@
+import asyncio
+import os
+import subprocess
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# URL служебной БД PostgreSQL, в которой тест создаёт и удаляет временную базу
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="нужен TEST_DATABASE_URL")
+
+
+def database_url(name: str):
+    return make_url(TEST_DATABASE_URL).set(drivername="postgresql+asyncpg", database=name)
+
+
+async def execute(name: str, *statements: str, autocommit: bool = False) -> list:
+    engine = create_async_engine(database_url(name), isolation_level="AUTOCOMMIT" if autocommit else None)
+    try:
+        async with engine.begin() as conn:
+            results = []
+            for statement in statements:
+                result = await conn.execute(text(statement))
+                results.append(result.all() if result.returns_rows else None)
+            return results
+    finally:
+        await engine.dispose()
+
+
+# Запустить миграции сервиса так же, как это делают вручную: python -m app.db.migrations
+def run_migrations(service: str, name: str) -> str:
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url(name).set(drivername="postgresql").render_as_string(hide_password=False),
+        JWT_SECRET_KEY="test",
+        ACCOUNT_SERVICE_URL="http://account",
+        HOSPITAL_SERVICE_URL="http://hospital",
+    )
+    result = subprocess.run(
+        [sys.executable, "-m", "app.db.migrations"],
+        cwd=ROOT / service, env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+@pytest.fixture
+def database():
+    admin = make_url(TEST_DATABASE_URL).database
+    name = f"migrations_test_{uuid.uuid4().hex[:12]}"
+    asyncio.run(execute(admin, f"CREATE DATABASE {name}", autocommit=True))
+    yield name
+    asyncio.run(execute(admin, f"DROP DATABASE {name} WITH (FORCE)", autocommit=True))
+
+
+# Сервисы из docker-compose работают в одной БД: миграции одного не должны
+# скрывать миграции другого, в каком бы порядке они ни запускались
+def test_services_share_one_database(database):
+    for service in ("account_service", "timetable_service", "hospital_service"):
+        assert "Применены миграции" in run_migrations(service, database)
+    for service in ("account_service", "timetable_service", "hospital_service"):
+        assert "Схема БД актуальна" in run_migrations(service, database)
+
+    unique_slot, directory_version = asyncio.run(execute(
+        database,
+        "SELECT to_regclass('ux_appointments_timetable_id_time')",
+        "SELECT to_regclass('hospital_directory_version')",
+    ))
+    assert unique_slot[0][0] is not None
+    assert directory_version[0][0] is not None
+
+    # Запись на приём опирается на ON CONFLICT (timetable_id, time)
+    asyncio.run(execute(
+        database,
+        "INSERT INTO timetables (hospital_id, doctor_id, from_time, to_time, room) "
+        "VALUES (1, 1, '2030-01-01 08:00', '2030-01-01 09:00', 'r')",
+        *["INSERT INTO appointments (timetable_id, username, time) "
+          "SELECT id, 'u', from_time FROM timetables ON CONFLICT (timetable_id, time) DO NOTHING"] * 2,
+    ))
+    count, = asyncio.run(execute(database, "SELECT count(*) FROM appointments"))
+    assert count[0][0] == 1
+
+
+# Старая общая таблица schema_migrations с версиями другого сервиса не мешает
+def test_legacy_shared_migrations_table(database):
+    asyncio.run(execute(
+        database,
+        "CREATE TABLE schema_migrations (version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at TIMESTAMP)",
+        "INSERT INTO schema_migrations (version, name) VALUES (1, 'a'), (2, 'b'), (3, 'c'), (4, 'd')",
+    ))
+    for service in ("timetable_service", "hospital_service", "account_service"):
+        run_migrations(service, database)
+
+    tables, = asyncio.run(execute(
+        database,
+        "SELECT to_regclass('timetables'), to_regclass('hospital_rooms'), to_regclass('users')",
+    ))
+    assert all(table is not None for table in tables[0])
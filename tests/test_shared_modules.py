@@ -0,0 +1,25 @@
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Общие модули app/core, скопированные в сервисы. Исправление в одной копии
+# должно попасть во все: копии обязаны совпадать байт в байт
+SHARED_MODULES = {
+    "http_client.py": ["hospital_service", "timetable_service", "document_service"],
+    "resilience.py": ["hospital_service", "timetable_service", "document_service"],
+    "jwks.py": ["hospital_service", "timetable_service", "document_service"],
+    "cache.py": ["hospital_service", "timetable_service", "document_service"],
+    "lookup_cache.py": ["timetable_service", "document_service"],
+    "validation.py": ["timetable_service", "document_service"],
+}
+
+
+@pytest.mark.parametrize("module", sorted(SHARED_MODULES))
+def test_shared_module_copies_are_identical(module):
+    services = SHARED_MODULES[module]
+    copies = {service: (ROOT / service / "app" / "core" / module).read_bytes() for service in services}
+    reference = services[0]
+    differing = [service for service in services[1:] if copies[service] != copies[reference]]
+    assert not differing, f"{module} в {', '.join(differing)} отличается от копии в {reference}"
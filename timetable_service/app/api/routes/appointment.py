@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import json
 
 from app.services.appointment import cancel_appointment
@@ -20,12 +20,12 @@ router = APIRouter()
 @router.delete("/{id}/", include_in_schema=False, status_code=200)
 async def cancel_appointment_route(
     id: int, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     current_user: dict = Depends(verify_user_token)
 ):
     username = current_user.get("username")  
     user_roles = current_user.get("roles", [])
 
-    cancel_appointment(db=db, appointment_id=id, username=username, user_roles=user_roles)
+    await cancel_appointment(db=db, appointment_id=id, username=username, user_roles=user_roles)
     
     return JSONResponse(content={"message": "Запись на приём успешно отменена"})
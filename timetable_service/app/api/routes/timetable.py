@@ -1,9 +1,9 @@
 import json
-from fastapi import APIRouter, Depends, Request
-from typing import List
+from fastapi import APIRouter, Depends, Request, Response
+from typing import List, Optional
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from app.schemas.timetable import TimetableCreate, TimetableUpdate, TimetableResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.timetable import TimetableCreate, TimetableUpdate, TimetableResponse, TimetableTemplate, TimetableTemplateResult, FreeSlot
 from app.schemas.appointment import AppointmentCreate
 from app.services.timetable import (
     create_timetable, 
@@ -15,8 +15,11 @@ from app.services.timetable import (
     get_available_appointments,
     book_appointment,
     delete_doctor_timetables,
-    delete_hospital_timetables
+    delete_hospital_timetables,
+    search_free_slots
 )
+from app.services.timetable_templates import create_timetables_from_template
+from app.services.timetable_deletion import DeleteJob, get_delete_job
 from app.db.session import get_db
 from app.utils import verify_admin_or_manager_or_doctor, verify_user_token, verify_admin_or_manager
 
@@ -34,11 +37,28 @@ router = APIRouter()
 async def create_timetable_entry(
     request: Request,  
     timetable: TimetableCreate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     user: dict = Depends(verify_admin_or_manager)
 ):
     return await create_timetable(db=db, timetable=timetable, request=request)
 
+# Создание расписаний по повторяющемуся шаблону
+@router.post("/Template", response_model=TimetableTemplateResult, status_code=201,
+             summary=api_docs["create_timetable_template"]["summary"],
+             description=api_docs["create_timetable_template"]["description"])
+@router.post("/Template/", include_in_schema=False, response_model=TimetableTemplateResult, status_code=201)
+async def create_timetable_template(
+    request: Request,
+    response: Response,
+    template: TimetableTemplate,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(verify_admin_or_manager)
+):
+    result = await create_timetables_from_template(db=db, template=template, request=request)
+    if template.dry_run:
+        response.status_code = 200
+    return result
+
 # Обновление записи расписания
 @router.put("/{id}", response_model=TimetableResponse, 
             summary=api_docs["update_timetable"]["summary"],
@@ -48,7 +68,7 @@ async def update_timetable_entry(
     request: Request,
     id: int, 
     timetable: TimetableUpdate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     user: dict = Depends(verify_admin_or_manager)
 ):
     return await update_timetable(db=db, timetable_id=id, timetable=timetable, request=request)
@@ -60,10 +80,10 @@ async def update_timetable_entry(
 @router.delete("/{id}/", include_in_schema=False, status_code=200)
 async def delete_timetable_entry(
     id: int, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     user: dict = Depends(verify_admin_or_manager)
 ):
-    delete_timetable(db=db, timetable_id=id)
+    await delete_timetable(db=db, timetable_id=id)
     return JSONResponse(content={"message": "Запись расписания успешно удалена"})
 
 # Удаление записей расписания доктора
@@ -73,11 +93,13 @@ async def delete_timetable_entry(
 @router.delete("/Doctor/{doctor_id}/", include_in_schema=False, status_code=200)
 async def delete_doctor_schedule(
     doctor_id: int, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     user: dict = Depends(verify_admin_or_manager)
 ):
-    delete_doctor_timetables(db=db, doctor_id=doctor_id)
-    return JSONResponse(content={"message": "Запись расписания доктора успешно удалена"})
+    result = await delete_doctor_timetables(db=db, doctor_id=doctor_id)
+    if isinstance(result, DeleteJob):
+        return JSONResponse(status_code=202, content=result.to_dict())
+    return JSONResponse(content={"message": "Запись расписания доктора успешно удалена", "deleted": result})
 
 # Удаление записей расписания больницы
 @router.delete("/Hospital/{hospital_id}", status_code=200, 
@@ -85,11 +107,48 @@ async def delete_doctor_schedule(
                description=api_docs["delete_hospital_schedule"]["description"])
 async def delete_hospital_schedule(
     hospital_id: int, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     user: dict = Depends(verify_admin_or_manager)
 ):
-    delete_hospital_timetables(db=db, hospital_id=hospital_id)
-    return JSONResponse(content={"message": "Запись расписания больницы успешно удалена"})
+    result = await delete_hospital_timetables(db=db, hospital_id=hospital_id)
+    if isinstance(result, DeleteJob):
+        return JSONResponse(status_code=202, content=result.to_dict())
+    return JSONResponse(content={"message": "Запись расписания больницы успешно удалена", "deleted": result})
+
+
+# Прогресс фонового удаления расписаний
+@router.get("/DeleteJobs/{job_id}", status_code=200,
+            summary=api_docs["get_delete_job"]["summary"],
+            description=api_docs["get_delete_job"]["description"])
+@router.get("/DeleteJobs/{job_id}/", include_in_schema=False, status_code=200)
+async def get_delete_progress(job_id: str, user: dict = Depends(verify_admin_or_manager)):
+    return JSONResponse(content=get_delete_job(job_id).to_dict())
+
+# Поиск ближайших свободных талонов по всем подходящим расписаниям
+@router.get("/Search/FreeSlots", response_model=List[FreeSlot],
+            summary=api_docs["search_free_slots"]["summary"],
+            description=api_docs["search_free_slots"]["description"],
+            response_description="Список свободных талонов, ближайшие первыми.")
+@router.get("/Search/FreeSlots/", include_in_schema=False, response_model=List[FreeSlot])
+async def search_free_slots_route(
+    hospital_id: Optional[int] = None,
+    doctor_id: Optional[int] = None,
+    room: Optional[str] = None,
+    from_time: Optional[str] = None,
+    to_time: Optional[str] = None,
+    limit: int = 10,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(verify_user_token)
+):
+    return await search_free_slots(
+        db=db,
+        hospital_id=hospital_id,
+        doctor_id=doctor_id,
+        room=room,
+        from_time=from_time,
+        to_time=to_time,
+        limit=limit,
+    )
 
 # Получение расписания больницы по Id
 @router.get("/Hospital/{hospital_id}", response_model=List[TimetableResponse], 
@@ -102,7 +161,7 @@ async def get_hospital_timetables(
     from_time: str,  
     to_time: str,    
     request: Request,
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     user: dict = Depends(verify_user_token)
 ):
     return await get_timetable_by_hospital(db=db, hospital_id=hospital_id, from_time=from_time, to_time=to_time, request=request)
@@ -118,7 +177,7 @@ async def get_doctor_timetables(
     from_time: str,  
     to_time: str,  
     request: Request, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     user: dict = Depends(verify_user_token)
 ):
     return await get_timetable_by_doctor(db=db, doctor_id=doctor_id, from_time=from_time, to_time=to_time, request=request)
@@ -135,7 +194,7 @@ async def get_room_schedule_route(
     from_time: str,  
     to_time: str,    
     request: Request,
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     user: dict = Depends(verify_admin_or_manager_or_doctor)
 ):
     return await get_room_schedule(db=db, hospital_id=hospital_id, room=room, from_time=from_time, to_time=to_time, request=request)
@@ -148,10 +207,10 @@ async def get_room_schedule_route(
 @router.get("/{id}/Appointments/", include_in_schema=False, response_model=List[str])
 async def get_available_appointments_route(
     id: int, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     user: dict = Depends(verify_user_token)
 ):
-    return get_available_appointments(db=db, timetable_id=id)
+    return await get_available_appointments(db=db, timetable_id=id)
 
 # Записаться на приём
 @router.post("/{id}/Appointments", status_code=200, 
@@ -161,10 +220,10 @@ async def get_available_appointments_route(
 async def book_appointment_route(
     id: int, 
     appointment: AppointmentCreate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     user: dict = Depends(verify_user_token)
 ):
     username = user.get('username')
-    book_appointment(db=db, timetable_id=id, time=appointment.time, username=username)
+    await book_appointment(db=db, timetable_id=id, time=appointment.time, username=username)
     
     return JSONResponse(content={"message": "Запись успешно забронирована"})
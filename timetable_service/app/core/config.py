@@ -3,8 +3,43 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str = os.getenv('DATABASE_URL')
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    MIGRATE_ON_STARTUP: bool = True
     ACCOUNT_SERVICE_URL: str = os.getenv('ACCOUNT_SERVICE_URL')
     HOSPITAL_SERVICE_URL: str = os.getenv('HOSPITAL_SERVICE_URL')
-    
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_TIMEOUT: float = 5.0
+    HTTP_CONNECT_TIMEOUT: float = 2.0
+    HTTP2: bool = False
+    HTTP_MAX_RETRIES: int = 2
+    HTTP_REQUEST_DEADLINE: float = 6.0
+    HTTP_RETRY_BACKOFF: float = 0.05
+    HTTP_RETRY_BUDGET_RATIO: float = 0.2
+    HTTP_RETRY_BUDGET_MAX: float = 10.0
+    HTTP_HEDGE_ENABLED: bool = True
+    HTTP_HEDGE_MIN_DELAY: float = 0.01
+    HTTP_HEDGE_MIN_SAMPLES: int = 20
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_TIMEOUT: float = 10.0
+    TOKEN_CACHE_TTL: float = 5.0
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    JWKS_REFRESH_INTERVAL: float = 300.0
+    JWKS_MIN_REFRESH_INTERVAL: float = 10.0
+    LOOKUP_CACHE_MAX_SIZE: int = 10000
+    DOCTOR_CACHE_TTL: float = 60.0
+    HOSPITAL_CACHE_TTL: float = 60.0
+    LOOKUP_CACHE_NEGATIVE_TTL: float = 5.0
+    VALIDATION_DEADLINE: float = 5.0
+    TIMETABLE_TEMPLATE_MAX_DAYS: int = 366
+    TIMETABLE_TEMPLATE_BATCH_SIZE: int = 500
+    TIMETABLE_DELETE_CHUNK_SIZE: int = 1000
+    TIMETABLE_DELETE_JOB_THRESHOLD: int = 5000
+    FREE_SLOT_SEARCH_MAX_DAYS: int = 31
+    FREE_SLOT_SEARCH_MAX_LIMIT: int = 100
+    FREE_SLOT_SEARCH_WINDOW_HOURS: int = 6
+
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from jose import JWTError, jwt
+from app.core.config import settings
+from app.core.http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+ASYMMETRIC_ALGORITHMS = ("RS256",)
+
+# Токеном доступа может быть только токен с typ = access (не refresh token)
+ACCESS_TOKEN_TYPE = "access"
+
+
+# Публичные ключи микросервиса аккаунтов (JWKS). Обновляются периодически
+# и при появлении неизвестного kid (после ротации), но не чаще JWKS_MIN_REFRESH_INTERVAL.
+class JWKSClient:
+    def __init__(self, url: str):
+        self.url = url
+        self._keys: Dict[str, dict] = {}
+        self._fetched_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _age(self) -> float:
+        return float("inf") if self._fetched_at is None else time.monotonic() - self._fetched_at
+
+    async def refresh(self):
+        async with self._lock:
+            if self._age() < settings.JWKS_MIN_REFRESH_INTERVAL:
+                return
+            try:
+                response = await http_client.get(self.url)
+                response.raise_for_status()
+                self._keys = {key["kid"]: key for key in response.json().get("keys", []) if "kid" in key}
+            except Exception as e:
+                logger.warning("Не удалось получить JWKS: %s", e)
+            self._fetched_at = time.monotonic()
+
+    async def get_key(self, kid: str) -> Optional[dict]:
+        if kid not in self._keys or self._age() > settings.JWKS_REFRESH_INTERVAL:
+            await self.refresh()
+        return self._keys.get(kid)
+
+
+jwks_client = JWKSClient(f"{settings.ACCOUNT_SERVICE_URL}/api/Authentication/JWKS")
+
+
+# Ответ в формате /api/Authentication/Validate
+def token_info_from_claims(claims: dict) -> dict:
+    return {
+        "username": claims.get("username"),
+        "user_id": claims.get("user_id"),
+        "roles": claims.get("roles", []),
+        "issued_at": datetime.fromtimestamp(claims.get("iat", 0), tz=timezone.utc).isoformat(),
+        "expires_at": datetime.fromtimestamp(claims.get("exp", 0), tz=timezone.utc).isoformat(),
+        "token_is_valid": True,
+    }
+
+
+# Локальная проверка подписи и срока действия токена.
+# None - токен подписан симметричным ключом или ключ неизвестен: нужна интроспекция.
+# JWTError - подпись, срок действия или тип токена недействительны.
+async def decode_token_locally(access_token: str) -> Optional[dict]:
+    header = jwt.get_unverified_header(access_token)
+    if header.get("alg") not in ASYMMETRIC_ALGORITHMS or not header.get("kid"):
+        return None
+
+    key = await jwks_client.get_key(header["kid"])
+    if key is None:
+        return None
+
+    claims = jwt.decode(access_token, key, algorithms=[header["alg"]])
+    if claims.get("typ") != ACCESS_TOKEN_TYPE:
+        raise JWTError("Неверный тип токена")
+    return claims
+
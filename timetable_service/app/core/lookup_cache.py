@@ -0,0 +1,94 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from app.core.cache import MISSING, TTLCache
+
+# Отметка "объект не найден" (ответ 404), хранится с коротким сроком жизни
+NOT_FOUND = object()
+
+
+# Кэш данных других сервисов (больницы, врачи): LRU с TTL и отрицательными записями.
+# Одновременные промахи по одному ключу объединяются в один исходящий запрос.
+class LookupCache:
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float):
+        self.negative_ttl = negative_ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        # Увеличивается при сбросе: загрузка, начатая до сброса, не попадает в кэш
+        self._generation = 0
+        self.negative_hits = 0
+        self.coalesced = 0
+        self.loads = 0
+        self.load_errors = 0
+
+    # Значение из кэша: MISSING - записи нет, None - объект не найден
+    def lookup(self, key: Hashable) -> Any:
+        value = self._cache.get(key)
+        if value is NOT_FOUND:
+            self.negative_hits += 1
+            return None
+        return value
+
+    def store(self, key: Hashable, value: Optional[Any]):
+        if value is None:
+            self._cache.set(key, NOT_FOUND, ttl=self.negative_ttl)
+        else:
+            self._cache.set(key, value)
+
+    # loader возвращает объект или None, если его нет (404).
+    # Ожидающие запросы получают результат загрузки, начатой первым из них.
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        value = self.lookup(key)
+        if value is not MISSING:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader, self._generation))
+            task.add_done_callback(_retrieve_exception)
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        # Отмена одного запроса не прерывает загрузку для остальных
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Optional[Any]]], generation: int):
+        self.loads += 1
+        try:
+            value = await loader()
+        except BaseException:
+            self.load_errors += 1
+            raise
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+        if generation == self._generation:
+            self.store(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> bool:
+        self._generation += 1
+        self._inflight.pop(key, None)
+        return self._cache.invalidate(key)
+
+    def clear(self) -> int:
+        self._generation += 1
+        self._inflight.clear()
+        size = len(self._cache)
+        self._cache.clear()
+        return size
+
+    def stats(self) -> dict:
+        return {
+            **self._cache.stats(),
+            "negative_ttl": self.negative_ttl,
+            "negative_hits": self.negative_hits,
+            "coalesced": self.coalesced,
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "inflight": len(self._inflight),
+        }
+
+
+def _retrieve_exception(task: asyncio.Task):
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,55 @@
+import logging
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+logger = logging.getLogger(__name__)
+
+# Поиск пересечений по кабинету и врачу: диапазонный скан по from_time
+# (запросы ограничивают from_time снизу максимальной длительностью расписания)
+SCHEDULE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_timetables_room_from_time ON timetables (hospital_id, room, from_time)",
+    "CREATE INDEX IF NOT EXISTS ix_timetables_doctor_from_time ON timetables (doctor_id, from_time)",
+]
+
+# Исключающие ограничения: кабинет и врач не могут быть заняты двумя расписаниями одновременно.
+# Их GiST-индексы обслуживают и запросы с tsrange(from_time, to_time) && tsrange(...)
+EXCLUSION_CONSTRAINTS = {
+    "ex_timetables_room_overlap":
+        "EXCLUDE USING gist (hospital_id WITH =, room WITH =, tsrange(from_time, to_time) WITH &&)",
+    "ex_timetables_doctor_overlap":
+        "EXCLUDE USING gist (doctor_id WITH =, tsrange(from_time, to_time) WITH &&)",
+}
+
+# Уже существующие пересечения (до появления проверки при изменении расписания)
+OVERLAPS_QUERY = {
+    "ex_timetables_room_overlap": """SELECT count(*) FROM timetables a JOIN timetables b
+        ON a.id < b.id AND a.hospital_id = b.hospital_id AND a.room = b.room
+        AND a.from_time < b.to_time AND a.to_time > b.from_time""",
+    "ex_timetables_doctor_overlap": """SELECT count(*) FROM timetables a JOIN timetables b
+        ON a.id < b.id AND a.doctor_id = b.doctor_id
+        AND a.from_time < b.to_time AND a.to_time > b.from_time""",
+}
+
+
+# Индексы и ограничения расписаний. Для ограничений нужно расширение btree_gist;
+# без него (или пока в данных есть пересечения) пересечения исключает только проверка
+# в приложении под advisory-блокировкой, а поиск идёт по btree-индексам.
+async def create_schedule_constraints(conn: AsyncConnection):
+    for statement in SCHEDULE_INDEXES:
+        await conn.execute(text(statement))
+
+    available = await conn.scalar(text("SELECT count(*) FROM pg_available_extensions WHERE name = 'btree_gist'"))
+    if not available:
+        logger.warning("Расширение btree_gist недоступно, исключающие ограничения расписаний не созданы")
+        return
+
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+    for name, definition in EXCLUSION_CONSTRAINTS.items():
+        exists = await conn.scalar(text("SELECT count(*) FROM pg_constraint WHERE conname = :name"), {"name": name})
+        if exists:
+            continue
+        overlaps = await conn.scalar(text(OVERLAPS_QUERY[name]))
+        if overlaps:
+            logger.warning("Ограничение %s не создано: пересекающихся расписаний - %s", name, overlaps)
+            continue
+        await conn.execute(text(f"ALTER TABLE timetables ADD CONSTRAINT {name} {definition}"))
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import sys
+from typing import Awaitable, Callable, List, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from app.db.indexes import create_schedule_constraints
+
+logger = logging.getLogger(__name__)
+
+# Ключ pg_advisory_xact_lock: миграции применяет только один процесс, остальные ждут
+MIGRATIONS_LOCK_KEY = 72330001
+
+# Таблица применённых миграций - своя у каждого сервиса: в docker-compose все сервисы
+# работают в одной БД. Миграции идемпотентны, поэтому при переходе со старой общей
+# таблицы schema_migrations они просто применяются повторно.
+MIGRATIONS_TABLE = "timetable_schema_migrations"
+
+Migration = Tuple[int, str, Callable[[AsyncConnection], Awaitable[None]]]
+
+
+async def _execute(conn: AsyncConnection, *statements: str):
+    for statement in statements:
+        await conn.execute(text(statement))
+
+
+# 1. Исходная схема (совпадает с тем, что создавал create_all, поэтому безопасна для существующих БД)
+async def initial_schema(conn: AsyncConnection):
+    await _execute(
+        conn,
+        """CREATE TABLE IF NOT EXISTS timetables (
+            id SERIAL NOT NULL PRIMARY KEY,
+            hospital_id INTEGER NOT NULL,
+            doctor_id INTEGER NOT NULL,
+            from_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            to_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            room VARCHAR NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_timetables_id ON timetables (id)",
+        """CREATE TABLE IF NOT EXISTS appointments (
+            id SERIAL NOT NULL PRIMARY KEY,
+            timetable_id INTEGER REFERENCES timetables (id),
+            username VARCHAR NOT NULL,
+            time TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_appointments_id ON appointments (id)",
+    )
+
+
+# 2. Один талон - одна запись: уникальный индекс (timetable_id, time).
+# Если гонка уже привела к двойным записям, остаётся самая ранняя.
+async def appointment_slot_unique(conn: AsyncConnection):
+    await _execute(
+        conn,
+        """DELETE FROM appointments a
+            USING appointments b
+            WHERE a.timetable_id = b.timetable_id AND a.time = b.time AND a.id > b.id""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_appointments_timetable_id_time ON appointments (timetable_id, time)",
+    )
+
+
+# 4. Записи на приём удаляются вместе с расписанием. Записи, уже оставшиеся без
+# расписания (ORM обнулял timetable_id при удалении), удаляются
+async def appointment_cascade(conn: AsyncConnection):
+    await _execute(
+        conn,
+        "DELETE FROM appointments WHERE timetable_id IS NULL",
+        "ALTER TABLE appointments DROP CONSTRAINT IF EXISTS appointments_timetable_id_fkey",
+        "ALTER TABLE appointments ADD CONSTRAINT appointments_timetable_id_fkey "
+        "FOREIGN KEY (timetable_id) REFERENCES timetables (id) ON DELETE CASCADE",
+    )
+
+
+# 5. Поиск свободных талонов без фильтра по больнице и врачу: диапазонный скан по from_time
+async def free_slot_search_index(conn: AsyncConnection):
+    await _execute(conn, "CREATE INDEX IF NOT EXISTS ix_timetables_from_time ON timetables (from_time)")
+
+
+MIGRATIONS: List[Migration] = [
+    (1, "initial_schema", initial_schema),
+    (2, "appointment_slot_unique", appointment_slot_unique),
+    (3, "schedule_constraints", create_schedule_constraints),
+    (4, "appointment_cascade", appointment_cascade),
+    (5, "free_slot_search_index", free_slot_search_index),
+]
+
+
+# Применить недостающие миграции в одной транзакции. Возвращает номера применённых
+async def run_migrations(engine: AsyncEngine) -> List[int]:
+    applied_now = []
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+        await _execute(
+            conn,
+            f"""CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR NOT NULL,
+                applied_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+            )""",
+        )
+        applied = set(await conn.scalars(text(f"SELECT version FROM {MIGRATIONS_TABLE}")))
+
+        for version, name, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            logger.info("Применение миграции %s_%s", version, name)
+            await migrate(conn)
+            await conn.execute(
+                text(f"INSERT INTO {MIGRATIONS_TABLE} (version, name) VALUES (:version, :name)"),
+                {"version": version, "name": name},
+            )
+            applied_now.append(version)
+    return applied_now
+
+
+# Применение миграций вне запуска сервиса: python -m app.db.migrations
+if __name__ == "__main__":
+    from app.db.database import engine
+
+    async def main():
+        applied = await run_migrations(engine)
+        await engine.dispose()
+        print(f"Применены миграции: {applied}" if applied else "Схема БД актуальна")
+
+    if sys.argv[1:]:
+        sys.exit("Использование: python -m app.db.migrations")
+    asyncio.run(main())
@@ -1,7 +1,26 @@
-from fastapi import FastAPI
+from typing import Literal, Optional
+from fastapi import Depends, FastAPI, HTTPException, Security
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from app.api.routes import timetable, appointment
-from app.db.database import Base, engine
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core.http_client import http_client
+from app.core.validation import validation_stats
+from app.core.config import settings
+from app.db.database import engine
+from app.db.migrations import run_migrations
+from app.utils import bearer_scheme, invalidate_lookups, invalidate_token, lookup_cache_stats, token_cache, verify_admin_user
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.MIGRATE_ON_STARTUP:
+        await run_migrations(engine)
+    await http_client.start()
+
+    yield
+
+    await http_client.close()
+    await engine.dispose()
 
 app = FastAPI(
     title="МИКРОСЕРВИС РАСПИСАНИЯ",
@@ -12,12 +31,10 @@ app = FastAPI(
                     сущностей. Отправляет запросы в микросервис больниц для 
                     проверки существования связанных сущностей""",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 
-Base.metadata.create_all(bind=engine)
-
-
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
@@ -33,3 +50,28 @@ app.include_router(appointment.router, prefix="/api/Appointment", tags=["Appoint
 def read_root():
     return {"message": "Timetable Service"}
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return {
+        "http_client": http_client.stats(),
+        "token_cache": token_cache.stats(),
+        "lookup_cache": lookup_cache_stats(),
+        "validation": validation_stats.stats(),
+    }
+
+# Немедленный сброс закэшированной проверки токена в этом воркере (без него запись истекает через TOKEN_CACHE_TTL)
+@app.post("/TokenCache/Invalidate", include_in_schema=False)
+def invalidate_token_cache(token: HTTPAuthorizationCredentials = Security(bearer_scheme)):
+    invalidate_token(token.credentials)
+    return {"message": "Кэш токена сброшен"}
+
+# Сброс кэша больниц и врачей: одна запись (kind и id) или весь кэш. Только для администраторов
+@app.post("/LookupCache/Invalidate", include_in_schema=False)
+def invalidate_lookup_cache(
+    kind: Optional[Literal["doctors", "hospitals"]] = None,
+    id: Optional[int] = None,
+    user: dict = Depends(verify_admin_user)
+):
+    if id is not None and kind is None:
+        raise HTTPException(status_code=400, detail="Для сброса записи по ID укажите kind")
+    return {"message": "Кэш сброшен", "invalidated": invalidate_lookups(kind, id)}
@@ -1,16 +1,22 @@
-from sqlalchemy import Column, ForeignKey, Integer, DateTime, String
+from sqlalchemy import Column, ForeignKey, Index, Integer, String
 from app.db.database import Base
+from app.db.types import UTCDateTime
 from sqlalchemy.orm import relationship
 class Appointment(Base):
     __tablename__ = "appointments"
     
     id = Column(Integer, primary_key=True, index=True)
-    timetable_id = Column(Integer, ForeignKey('timetables.id')) 
+    timetable_id = Column(Integer, ForeignKey('timetables.id', ondelete='CASCADE')) 
     username = Column(String, nullable=False)  
-    time = Column(DateTime, nullable=False)
+    time = Column(UTCDateTime, nullable=False)
     
     timetable = relationship("Timetable", back_populates="appointments")
 
+    # Слот расписания бронируется не больше одного раза
+    __table_args__ = (
+        Index("ux_appointments_timetable_id_time", "timetable_id", "time", unique=True),
+    )
+
 
     def __repr__(self):
         return f"<Appointment(id={self.id}, timetable_id={self.timetable_id}, username={self.username}, time={self.time})>"
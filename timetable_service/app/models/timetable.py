@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, DateTime, String
+from sqlalchemy import Column, Integer, String
 from app.db.database import Base
+from app.db.types import UTCDateTime
 from sqlalchemy.orm import relationship
 
 
@@ -9,10 +10,17 @@ class Timetable(Base):
     id = Column(Integer, primary_key=True, index=True)
     hospital_id = Column(Integer, nullable=False)
     doctor_id = Column(Integer, nullable=False)
-    from_time = Column(DateTime, nullable=False)
-    to_time = Column(DateTime, nullable=False)
+    from_time = Column(UTCDateTime, nullable=False)
+    to_time = Column(UTCDateTime, nullable=False)
     room = Column(String, nullable=False)
-    appointments = relationship("Appointment", back_populates="timetable")
+    # Записи на приём удаляются вместе с расписанием (ON DELETE CASCADE в БД).
+    # Загружаются только там, где отдаются в ответе (selectinload / refresh)
+    appointments = relationship(
+        "Appointment",
+        back_populates="timetable",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
     
     def __repr__(self):
         return f"<Timetable(id={self.id}, hospital_id={self.hospital_id}, room={self.room})>"
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, field_validator
-from datetime import datetime
+from pydantic import BaseModel, Field, field_validator
+from datetime import date, datetime, time
 from typing import List
 from app.schemas.appointment import AppointmentResponse
 from dateutil import parser
@@ -38,3 +38,52 @@ class TimetableResponse(TimetableBase):
         json_encoders = {
             datetime: lambda v: v.strftime('%Y-%m-%d %H:%M:%S') 
         }
+
+
+# Повторяющееся расписание: дни недели weekdays с start_time до end_time (UTC)
+# в каждую подходящую дату с date_from по date_to включительно
+class TimetableTemplate(BaseModel):
+    hospital_id: int
+    doctor_id: int
+    room: str
+    weekdays: List[int] = Field(..., min_length=1, max_length=7, description="Дни недели: 1 - понедельник, 7 - воскресенье")
+    start_time: time
+    end_time: time
+    date_from: date
+    date_to: date
+    dry_run: bool = False
+
+    @field_validator('weekdays')
+    def validate_weekdays(cls, value):
+        if any(day < 1 or day > 7 for day in value):
+            raise ValueError("Дни недели задаются числами от 1 (понедельник) до 7 (воскресенье).")
+        return sorted(set(value))
+
+class TemplateConflict(BaseModel):
+    from_time: datetime
+    to_time: datetime
+    kind: str
+    timetable_id: int
+
+    class Config:
+        json_encoders = {
+            datetime: lambda v: v.strftime('%Y-%m-%d %H:%M:%S') 
+        }
+
+class TimetableTemplateResult(BaseModel):
+    dry_run: bool
+    total: int
+    created: int
+    conflicts: List[TemplateConflict]
+
+class FreeSlot(BaseModel):
+    timetable_id: int
+    hospital_id: int
+    doctor_id: int
+    room: str
+    time: datetime
+
+    class Config:
+        json_encoders = {
+            datetime: lambda v: v.strftime('%Y-%m-%d %H:%M:%S') 
+        }
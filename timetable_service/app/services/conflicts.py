@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import func, literal, select, text, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.timetable import Timetable
+from app.services.slots import to_naive_utc
+
+# Расписание не длиннее 12 часов, поэтому пересекающиеся расписания начинаются
+# не раньше чем за 12 часов до начала нового: это ограничивает скан индекса по from_time
+MAX_TIMETABLE_DURATION = timedelta(hours=12)
+
+# Пространства ключей pg_advisory_xact_lock(int, int) для кабинетов и врачей
+ROOM_LOCK_NAMESPACE = 72330101
+DOCTOR_LOCK_NAMESPACE = 72330102
+
+# SQLSTATE exclusion_violation
+EXCLUSION_VIOLATION = "23P01"
+
+
+def room_conflict_message(timetable_id: int) -> str:
+    return f"Существует конфликт расписания с этой комнатой в указанный промежуток времени (расписание {timetable_id})."
+
+
+def doctor_conflict_message(timetable_id: int) -> str:
+    return f"Врач уже занят в указанный промежуток времени (расписание {timetable_id})."
+
+
+# Блокировки кабинета и врача до конца транзакции: одновременные записи в один кабинет
+# или к одному врачу проверяются и сохраняются по очереди. Порядок всегда
+# "кабинет, затем врач", поэтому взаимоблокировок нет.
+async def lock_schedule(db: AsyncSession, hospital_id: int, room: str, doctor_id: int):
+    await db.execute(
+        text(
+            "SELECT pg_advisory_xact_lock(:room_ns, hashtext(:room_key)), "
+            "pg_advisory_xact_lock(:doctor_ns, :doctor_id)"
+        ),
+        {
+            "room_ns": ROOM_LOCK_NAMESPACE,
+            "room_key": f"{hospital_id}:{room}",
+            "doctor_ns": DOCTOR_LOCK_NAMESPACE,
+            "doctor_id": doctor_id,
+        },
+    )
+
+
+def _overlapping(from_time: datetime, to_time: datetime, exclude_id: Optional[int]):
+    conditions = [
+        Timetable.from_time < to_time,
+        Timetable.to_time > from_time,
+        Timetable.from_time > from_time - MAX_TIMETABLE_DURATION,
+        func.tsrange(Timetable.from_time, Timetable.to_time).op("&&")(func.tsrange(from_time, to_time)),
+    ]
+    if exclude_id is not None:
+        conditions.append(Timetable.id != exclude_id)
+    return conditions
+
+
+# Первое пересечение по кабинету или врачу: ("room" | "doctor", id расписания) или None.
+# Оба поиска - один запрос, каждый обслуживается индексом
+async def find_conflict(
+    db: AsyncSession,
+    hospital_id: int,
+    room: str,
+    doctor_id: int,
+    from_time: datetime,
+    to_time: datetime,
+    exclude_id: Optional[int] = None,
+) -> Optional[Tuple[str, int]]:
+    from_time, to_time = to_naive_utc(from_time), to_naive_utc(to_time)
+    overlapping = _overlapping(from_time, to_time, exclude_id)
+    room_conflict = (
+        select(literal("room").label("kind"), Timetable.id)
+        .filter(Timetable.hospital_id == hospital_id, Timetable.room == room, *overlapping)
+        .order_by(Timetable.from_time)
+        .limit(1)
+    )
+    doctor_conflict = (
+        select(literal("doctor").label("kind"), Timetable.id)
+        .filter(Timetable.doctor_id == doctor_id, *overlapping)
+        .order_by(Timetable.from_time)
+        .limit(1)
+    )
+    row = (await db.execute(union_all(room_conflict.subquery().select(), doctor_conflict.subquery().select()))).first()
+    return (row.kind, row.id) if row else None
+
+
+# Проверка перед записью: блокировки и поиск пересечений, конфликт - 400 с id расписания
+async def ensure_no_conflict(
+    db: AsyncSession,
+    hospital_id: int,
+    room: str,
+    doctor_id: int,
+    from_time: datetime,
+    to_time: datetime,
+    exclude_id: Optional[int] = None,
+):
+    await lock_schedule(db, hospital_id, room, doctor_id)
+    conflict = await find_conflict(db, hospital_id, room, doctor_id, from_time, to_time, exclude_id)
+    if conflict is None:
+        return
+    kind, timetable_id = conflict
+    message = room_conflict_message(timetable_id) if kind == "room" else doctor_conflict_message(timetable_id)
+    raise HTTPException(status_code=400, detail=message)
+
+
+# Нарушение исключающего ограничения при commit (запись в обход блокировок):
+# откатить транзакцию и найти конфликтующее расписание для ответа
+async def raise_exclusion_conflict(
+    db: AsyncSession,
+    error: IntegrityError,
+    hospital_id: int,
+    room: str,
+    doctor_id: int,
+    from_time: datetime,
+    to_time: datetime,
+    exclude_id: Optional[int] = None,
+):
+    if getattr(error.orig, "sqlstate", None) != EXCLUSION_VIOLATION:
+        raise error
+    await db.rollback()
+    await ensure_no_conflict(db, hospital_id, room, doctor_id, from_time, to_time, exclude_id)
+    raise HTTPException(status_code=400, detail="Существует конфликт расписания в указанный промежуток времени.")
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import Interval, column, exists, func, literal, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.types import UTCDateTime
+from app.models.appointment import Appointment
+from app.models.timetable import Timetable
+from app.services.conflicts import MAX_TIMETABLE_DURATION
+from app.services.slots import SLOT_DURATION, to_naive_utc
+
+
+# Во сколько раз растёт следующее окно поиска
+WINDOW_GROWTH = 4
+
+
+# Свободные слоты, начинающиеся в [window_from, window_to) и заканчивающиеся не позже to_time:
+# слоты каждого расписания разворачиваются generate_series, занятые отсекаются anti-join
+# по уникальному индексу (timetable_id, time)
+async def _free_slots_in_window(
+    db: AsyncSession,
+    window_from: datetime,
+    window_to: datetime,
+    to_time: datetime,
+    limit: int,
+    filters: list,
+) -> List[dict]:
+    step = literal(SLOT_DURATION, Interval)
+    slot = (
+        func.generate_series(Timetable.from_time, Timetable.to_time - step, step)
+        .table_valued(column("time", UTCDateTime))
+        .render_derived(name="slot")
+    )
+    booked = exists().where(Appointment.timetable_id == Timetable.id, Appointment.time == slot.c.time)
+
+    # Расписание не длиннее MAX_TIMETABLE_DURATION: нижняя граница from_time
+    # ограничивает скан индекса по началу расписания
+    rows = await db.execute(
+        select(
+            Timetable.id.label("timetable_id"),
+            Timetable.hospital_id,
+            Timetable.doctor_id,
+            Timetable.room,
+            slot.c.time,
+        )
+        .select_from(Timetable)
+        .join(slot, true())
+        .filter(
+            *filters,
+            Timetable.from_time < window_to,
+            Timetable.from_time > window_from - MAX_TIMETABLE_DURATION,
+            Timetable.to_time > window_from,
+            slot.c.time >= window_from,
+            slot.c.time < window_to,
+            slot.c.time + step <= to_time,
+            ~booked,
+        )
+        .order_by(slot.c.time, Timetable.id)
+        .limit(limit)
+    )
+    return [row._asdict() for row in rows]
+
+
+# Ближайшие свободные слоты всех подходящих расписаний, целиком лежащие в [from_time, to_time].
+# Период просматривается окнами по времени начала слота (первое - FREE_SLOT_SEARCH_WINDOW_HOURS,
+# каждое следующее в WINDOW_GROWTH раз больше), пока не найдено limit слотов: при плотном
+# расписании не приходится разворачивать слоты всего периода ради первых limit
+async def find_free_slots(
+    db: AsyncSession,
+    from_time: datetime,
+    to_time: datetime,
+    limit: int,
+    hospital_id: Optional[int] = None,
+    doctor_id: Optional[int] = None,
+    room: Optional[str] = None,
+) -> List[dict]:
+    from_time, to_time = to_naive_utc(from_time), to_naive_utc(to_time)
+    filters = []
+    if hospital_id is not None:
+        filters.append(Timetable.hospital_id == hospital_id)
+    if doctor_id is not None:
+        filters.append(Timetable.doctor_id == doctor_id)
+    if room is not None:
+        filters.append(Timetable.room == room)
+
+    slots = []
+    window = timedelta(hours=settings.FREE_SLOT_SEARCH_WINDOW_HOURS)
+    window_from = from_time
+    while window_from < to_time and len(slots) < limit:
+        window_to = min(window_from + window, to_time)
+        slots += await _free_slots_in_window(db, window_from, window_to, to_time, limit - len(slots), filters)
+        window_from = window_to
+        window *= WINDOW_GROWTH
+    return slots
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set
+from sqlalchemy import Interval, extract, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import pytz
+from app.models.appointment import Appointment
+from app.models.timetable import Timetable
+
+SLOT_DURATION = timedelta(minutes=30)
+SLOT_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+# Приведение времени к наивному UTC (в таком виде время хранится в БД)
+def to_naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(pytz.UTC).replace(tzinfo=None)
+    return value
+
+
+# Все слоты расписания по 30 минут
+def iter_slots(from_time: datetime, to_time: datetime) -> List[datetime]:
+    from_time, to_time = to_naive_utc(from_time), to_naive_utc(to_time)
+    count = int((to_time - from_time) / SLOT_DURATION)
+    return [from_time + SLOT_DURATION * index for index in range(count)]
+
+
+# Номер слота для указанного времени или None, если время не попадает в сетку расписания
+def slot_index(timetable: Timetable, time: datetime) -> Optional[int]:
+    time = to_naive_utc(time)
+    from_time, to_time = to_naive_utc(timetable.from_time), to_naive_utc(timetable.to_time)
+    if time < from_time or time + SLOT_DURATION > to_time:
+        return None
+
+    offset = time - from_time
+    if offset % SLOT_DURATION:
+        return None
+    return offset // SLOT_DURATION
+
+
+# То же условие, что и slot_index, в SQL: время - начало одного из слотов расписания
+def slot_in_timetable(time: datetime) -> list:
+    time = literal(to_naive_utc(time), Timetable.from_time.type)
+    step = literal(SLOT_DURATION, Interval)
+    return [
+        time >= Timetable.from_time,
+        time + step <= Timetable.to_time,
+        func.mod(extract("epoch", time - Timetable.from_time), int(SLOT_DURATION.total_seconds())) == 0,
+    ]
+
+
+# Занятые слоты расписания одним запросом
+async def get_booked_times(db: AsyncSession, timetable_id: int) -> Set[datetime]:
+    times = await db.scalars(select(Appointment.time).filter(Appointment.timetable_id == timetable_id))
+    return {to_naive_utc(time) for time in times}
+
+
+# Свободные слоты расписания с учётом занятых
+def compute_free_slots(timetable: Timetable, booked: Iterable[datetime]) -> List[datetime]:
+    booked = set(booked)
+    return [slot for slot in iter_slots(timetable.from_time, timetable.to_time) if slot not in booked]
+
+
+# Свободные слоты расписания: один запрос к БД и вычисление в памяти
+async def get_free_slots(db: AsyncSession, timetable: Timetable) -> List[datetime]:
+    return compute_free_slots(timetable, await get_booked_times(db, timetable.id))
+
+
+def format_slot(slot: datetime) -> str:
+    return slot.strftime(SLOT_FORMAT)
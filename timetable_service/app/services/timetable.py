@@ -1,26 +1,48 @@
-from sqlalchemy.orm import Session, joinedload
+from typing import Optional
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from fastapi import HTTPException, Request
 from app.models.timetable import Timetable
 from app.models.appointment import Appointment
 from app.schemas.timetable import TimetableCreate, TimetableUpdate
+from app.services.slots import format_slot, get_free_slots, slot_in_timetable, slot_index, to_naive_utc
+from app.services.free_slots import find_free_slots
+from app.core.config import settings
+from app.core.validation import ValidationPipeline
+from app.db.database import SessionLocal
+from app.services.conflicts import ensure_no_conflict, raise_exclusion_conflict
+from app.services.timetable_deletion import delete_timetables
 from app.utils import get_doctor_by_id, get_hospital_by_id
 from datetime import datetime, timedelta
 from dateutil import parser 
 import pytz 
 
-# Создание новой записи в расписании
-async def create_timetable(db: Session, timetable: TimetableCreate, request: Request):
-    hospital_response = await get_hospital_by_id(timetable.hospital_id, request=request)
-    if not hospital_response:
+# Больница существует и в ней есть кабинет room. При обновлении (room_required=False)
+# кабинет проверяется, только если он указан
+async def check_hospital_room(hospital_id: int, room: Optional[str], request: Request, room_required: bool = True) -> dict:
+    hospital_response = await get_hospital_by_id(hospital_id, request=request)
+    if not hospital_response or 'rooms' not in hospital_response:
         raise HTTPException(status_code=400, detail="Недействительный ID больницы")
-    
-    available_rooms = hospital_response.get('rooms', [])
-    if timetable.room not in available_rooms:
+
+    if (room or room_required) and room not in hospital_response['rooms']:
         raise HTTPException(status_code=400, detail="Неверная комната. Комната не принадлежит указанной больнице")
-    
-    doctor_response = await get_doctor_by_id(timetable.doctor_id, request=request)
+    return hospital_response
+
+async def check_doctor(doctor_id: int, request: Request) -> dict:
+    doctor_response = await get_doctor_by_id(doctor_id, request=request)
     if not doctor_response:
         raise HTTPException(status_code=400, detail="Недействительный ID доктора")
+    return doctor_response
+
+# Создание новой записи в расписании
+async def create_timetable(db: AsyncSession, timetable: TimetableCreate, request: Request):
+    pipeline = ValidationPipeline()
+    pipeline.add("hospital", lambda: check_hospital_room(timetable.hospital_id, timetable.room, request))
+    pipeline.add("doctor", lambda: check_doctor(timetable.doctor_id, request))
+    await pipeline.run()
     
     if timetable.from_time.tzinfo is None:
         timetable.from_time = timetable.from_time.replace(tzinfo=pytz.UTC)
@@ -34,59 +56,46 @@ async def create_timetable(db: Session, timetable: TimetableCreate, request: Req
     if time_difference > 720 or time_difference % 30 != 0:
         raise HTTPException(status_code=400, detail="Недействительный диапазон времени или продолжительность")
     
-    check_if_timetable_exists = (
-        db.query(Timetable)
-        .filter(
-            Timetable.room == timetable.room,
-            Timetable.hospital_id == timetable.hospital_id,
-            Timetable.from_time < timetable.to_time,
-            Timetable.to_time > timetable.from_time
-        )
-        .first()
-    )
-    
-    if check_if_timetable_exists:
-        raise HTTPException(status_code=400, detail="Существует конфликт расписания с этой комнатой в указанный промежуток времени.")
+    schedule = (timetable.hospital_id, timetable.room, timetable.doctor_id, timetable.from_time, timetable.to_time)
+    await ensure_no_conflict(db, *schedule)
     
     db_timetable = Timetable(**timetable.model_dump())
     db.add(db_timetable)
-    db.commit()
-    db.refresh(db_timetable)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await raise_exclusion_conflict(db, e, *schedule)
+    await db.refresh(db_timetable)
+    await db.refresh(db_timetable, ["appointments"])
     
     return db_timetable
 
 
 # Обновление записи расписания
-async def update_timetable(db: Session, timetable_id: int, timetable: TimetableUpdate, request: Request):
-    db_timetable = db.query(Timetable).filter(Timetable.id == timetable_id).first()
+async def update_timetable(db: AsyncSession, timetable_id: int, timetable: TimetableUpdate, request: Request):
+    db_timetable = await db.scalar(select(Timetable).filter(Timetable.id == timetable_id))
     
     if not db_timetable:
         raise HTTPException(status_code=404, detail="Запись расписания не найдена")
     
-    if db.query(Appointment).filter(Appointment.timetable_id == timetable_id).count() > 0:
+    if await db.scalar(select(func.count(Appointment.id)).filter(Appointment.timetable_id == timetable_id)) > 0:
         raise HTTPException(status_code=400, detail="Нельзя изменить, есть записавшиеся на прием")
 
+    pipeline = ValidationPipeline()
+
     # Проверка если ID больницы изменился 
     hospital_changed = timetable.hospital_id and timetable.hospital_id != db_timetable.hospital_id
     
     if hospital_changed or timetable.room:
-        # Получение rooms в больнице
+        # Проверка существования указанной rooms в больнице
         hospital_id = timetable.hospital_id if hospital_changed else db_timetable.hospital_id
-        hospital_response = await get_hospital_by_id(hospital_id, request=request)
-        
-        if not hospital_response or 'rooms' not in hospital_response:
-            raise HTTPException(status_code=400, detail="Недействительный ID больницы")
-
-        available_rooms = hospital_response['rooms']
-        
-        # Проверка существования указанной rooms
-        if timetable.room and timetable.room not in available_rooms:
-            raise HTTPException(status_code=400, detail="Неверная комната. Комната не принадлежит указанной больнице")
+        pipeline.add("hospital", lambda: check_hospital_room(hospital_id, timetable.room, request, room_required=False))
 
     # Проверка если ID доктора изменился 
     if timetable.doctor_id and timetable.doctor_id != db_timetable.doctor_id:
-        if not await get_doctor_by_id(timetable.doctor_id, request=request):
-            raise HTTPException(status_code=400, detail="Недействительный ID доктора")
+        pipeline.add("doctor", lambda: check_doctor(timetable.doctor_id, request))
+
+    await pipeline.run()
 
     # Проверка временного диапазона
     from_time, to_time = timetable.from_time, timetable.to_time
@@ -110,46 +119,54 @@ async def update_timetable(db: Session, timetable_id: int, timetable: TimetableU
     for key, value in timetable.model_dump(exclude_unset=True).items():
         setattr(db_timetable, key, value)
 
-    db.commit()
-    db.refresh(db_timetable)
+    schedule = (
+        db_timetable.hospital_id, db_timetable.room, db_timetable.doctor_id, db_timetable.from_time, db_timetable.to_time
+    )
+    await ensure_no_conflict(db, *schedule, exclude_id=timetable_id)
+
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await raise_exclusion_conflict(db, e, *schedule, exclude_id=timetable_id)
+    await db.refresh(db_timetable)
+    await db.refresh(db_timetable, ["appointments"])
 
     return db_timetable
 
 
 
 # Удаление записи расписания
-def delete_timetable(db: Session, timetable_id: int):
-    db_timetable = db.query(Timetable).filter(Timetable.id == timetable_id).first()
-    if not db_timetable:
+async def delete_timetable(db: AsyncSession, timetable_id: int):
+    # Записи на приём удаляет каскад внешнего ключа
+    deleted_id = await db.scalar(delete(Timetable).where(Timetable.id == timetable_id).returning(Timetable.id))
+    if deleted_id is None:
         raise HTTPException(status_code=404, detail="Запись расписания не найдена")
-    
-    db.delete(db_timetable)
-    db.commit()
-
-#  Удаление записей расписания доктора
-def delete_doctor_timetables(db: Session, doctor_id: int):
-    db_timetables = db.query(Timetable).filter(Timetable.doctor_id == doctor_id).all()
-    if not db_timetables:
-        raise HTTPException(status_code=404, detail="Нет записей расписания для указанного врача")
-
-    for timetable in db_timetables:
-        db.delete(timetable)
-    
-    db.commit()
+    await db.commit()
 
-# Удаление записей расписания больницы
-def delete_hospital_timetables(db: Session, hospital_id: int):
-    db_timetables = db.query(Timetable).filter(Timetable.hospital_id == hospital_id).all()
-    if not db_timetables:
-        raise HTTPException(status_code=404, detail="Нет записей расписания для указанной больницы")
+#  Удаление записей расписания доктора: число удалённых или фоновая задача
+async def delete_doctor_timetables(db: AsyncSession, doctor_id: int):
+    return await delete_timetables(
+        db,
+        Timetable.doctor_id == doctor_id,
+        scope="doctor",
+        target_id=doctor_id,
+        not_found="Нет записей расписания для указанного врача",
+        session_factory=SessionLocal,
+    )
 
-    for timetable in db_timetables:
-        db.delete(timetable)
-    
-    db.commit()
+# Удаление записей расписания больницы: число удалённых или фоновая задача
+async def delete_hospital_timetables(db: AsyncSession, hospital_id: int):
+    return await delete_timetables(
+        db,
+        Timetable.hospital_id == hospital_id,
+        scope="hospital",
+        target_id=hospital_id,
+        not_found="Нет записей расписания для указанной больницы",
+        session_factory=SessionLocal,
+    )
 
 # Получение расписания больницы по Id
-async def get_timetable_by_hospital(db: Session, hospital_id: int, from_time: str, to_time: str, request: Request):
+async def get_timetable_by_hospital(db: AsyncSession, hospital_id: int, from_time: str, to_time: str, request: Request):
     hospital_response = await get_hospital_by_id(hospital_id, request=request)
     if not hospital_response:
         raise HTTPException(status_code=400, detail="Недействительный ID больницы")
@@ -161,16 +178,16 @@ async def get_timetable_by_hospital(db: Session, hospital_id: int, from_time: st
         raise HTTPException(status_code=400, detail="from_time и to_time должны быть в формате ISO 8601.")
 
 
-    timetables = db.query(Timetable).options(joinedload(Timetable.appointments)).filter(
+    timetables = await db.scalars(select(Timetable).options(selectinload(Timetable.appointments)).filter(
         Timetable.hospital_id == hospital_id,
         Timetable.from_time >= from_time_dt,
         Timetable.to_time <= to_time_dt
-    ).all()
+    ))
 
-    return timetables
+    return timetables.all()
 
 # Получение расписания врача по Id
-async def get_timetable_by_doctor(db: Session, doctor_id: int, from_time: str, to_time: str, request: Request):
+async def get_timetable_by_doctor(db: AsyncSession, doctor_id: int, from_time: str, to_time: str, request: Request):
     doctor_response = await get_doctor_by_id(doctor_id, request=request)
     if not doctor_response:
         raise HTTPException(status_code=400, detail="Недействительный ID врача")
@@ -181,16 +198,16 @@ async def get_timetable_by_doctor(db: Session, doctor_id: int, from_time: str, t
     except ValueError:
         raise HTTPException(status_code=400, detail="from_time и to_time должны быть в формате ISO 8601.")
 
-    timetables = db.query(Timetable).options(joinedload(Timetable.appointments)).filter(
+    timetables = await db.scalars(select(Timetable).options(selectinload(Timetable.appointments)).filter(
         Timetable.doctor_id == doctor_id,
         Timetable.from_time >= from_time_dt,
         Timetable.to_time <= to_time_dt
-    ).all()
+    ))
     
-    return timetables
+    return timetables.all()
 
 # Получение расписания кабинета больницы
-async def get_room_schedule(db: Session, hospital_id: int, room: str, from_time: str, to_time: str, request: Request):
+async def get_room_schedule(db: AsyncSession, hospital_id: int, room: str, from_time: str, to_time: str, request: Request):
     try:
         from_time_dt = parser.isoparse(from_time)
         to_time_dt = parser.isoparse(to_time)
@@ -205,69 +222,96 @@ async def get_room_schedule(db: Session, hospital_id: int, room: str, from_time:
     if room not in available_rooms:
         raise HTTPException(status_code=400, detail="Неверная комната. Комната не принадлежит указанной больнице")
 
-    timetables = db.query(Timetable).options(joinedload(Timetable.appointments)).filter(
+    timetables = await db.scalars(select(Timetable).options(selectinload(Timetable.appointments)).filter(
         Timetable.hospital_id == hospital_id,
         Timetable.room == room,
         Timetable.from_time >= from_time_dt,
         Timetable.to_time <= to_time_dt
-    ).all()
+    ))
 
+    timetables = timetables.all()
     if not timetables:
         raise HTTPException(status_code=404, detail="Расписания для этой комнаты не найдены")
 
     return timetables
 
 # Получение свободных талонов на приём.
-def get_available_appointments(db: Session, timetable_id: int):
-    db_timetable = db.query(Timetable).filter(Timetable.id == timetable_id).first()
+async def get_available_appointments(db: AsyncSession, timetable_id: int):
+    db_timetable = await db.scalar(select(Timetable).filter(Timetable.id == timetable_id))
     if not db_timetable:
         raise HTTPException(status_code=404, detail="Запись расписания не найдена")
 
-    available_slots = []
-    current_time = db_timetable.from_time
+    return [format_slot(slot) for slot in await get_free_slots(db, db_timetable)]
+
+# Поиск ближайших свободных талонов по больнице, врачу и кабинету. По умолчанию
+# ищутся талоны с текущего момента на FREE_SLOT_SEARCH_MAX_DAYS дней вперёд
+async def search_free_slots(
+    db: AsyncSession,
+    hospital_id: Optional[int],
+    doctor_id: Optional[int],
+    room: Optional[str],
+    from_time: Optional[str],
+    to_time: Optional[str],
+    limit: int,
+):
+    if limit < 1 or limit > settings.FREE_SLOT_SEARCH_MAX_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit должен быть от 1 до {settings.FREE_SLOT_SEARCH_MAX_LIMIT}",
+        )
+    max_period = timedelta(days=settings.FREE_SLOT_SEARCH_MAX_DAYS)
+    try:
+        from_time_dt = parser.isoparse(from_time) if from_time else datetime.now(pytz.UTC)
+        to_time_dt = parser.isoparse(to_time) if to_time else from_time_dt + max_period
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from_time и to_time должны быть в формате ISO 8601.")
 
-    while current_time < db_timetable.to_time:
-        if not db.query(Appointment).filter(
-            Appointment.timetable_id == timetable_id,
-            Appointment.time == current_time
-        ).first():
-            available_slots.append(current_time.strftime('%Y-%m-%d %H:%M:%S'))
-        
-        current_time += timedelta(minutes=30)
+    from_time_dt, to_time_dt = to_naive_utc(from_time_dt), to_naive_utc(to_time_dt)
+    if from_time_dt >= to_time_dt:
+        raise HTTPException(status_code=400, detail="Недействительный диапазон времени")
+    if to_time_dt - from_time_dt > max_period:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Период поиска не должен превышать {settings.FREE_SLOT_SEARCH_MAX_DAYS} дней",
+        )
 
-    return available_slots
+    return await find_free_slots(
+        db,
+        from_time_dt,
+        to_time_dt,
+        limit,
+        hospital_id=hospital_id,
+        doctor_id=doctor_id,
+        room=room,
+    )
 
 # Записаться на приём
-def book_appointment(db: Session, timetable_id: int, time: datetime, username: str):
-    db_timetable = db.query(Timetable).filter(Timetable.id == timetable_id).first()
-    if not db_timetable:
-        raise HTTPException(status_code=404, detail="Запись расписания не найдена")
-    
-    if db_timetable.from_time.tzinfo is None:
-        db_timetable.from_time = db_timetable.from_time.replace(tzinfo=pytz.UTC)
-    if db_timetable.to_time.tzinfo is None:
-        db_timetable.to_time = db_timetable.to_time.replace(tzinfo=pytz.UTC)
-    
+async def book_appointment(db: AsyncSession, timetable_id: int, time: datetime, username: str):
     time = time.astimezone(pytz.UTC)
 
-    available_slots = get_available_appointments(db, timetable_id)
-    
-    time_str = time.strftime('%Y-%m-%d %H:%M:%S')
-
-    if time_str not in available_slots:
-        raise HTTPException(status_code=400, detail="Время записи не доступно")
-
-    if db.query(Appointment).filter(Appointment.timetable_id == timetable_id, Appointment.time == time).first():
-        raise HTTPException(status_code=400, detail="Слот для записи уже забронирован")
-
-    appointment = Appointment(timetable_id=timetable_id, time=time, username=username)
-    db.add(appointment)
-    db.commit()
-    db.refresh(appointment)
-
-
-
-
+    # Проверка слота, занятости и вставка - один атомарный запрос: запись вставляется,
+    # только если время - слот расписания; из одновременных бронирований слота
+    # проходит только одно, остальные упираются в уникальный индекс
+    slot = select(Timetable.id, literal(to_naive_utc(time), Appointment.time.type), literal(username)).filter(
+        Timetable.id == timetable_id, *slot_in_timetable(time)
+    )
+    appointment_id = await db.scalar(
+        insert(Appointment)
+        .from_select(["timetable_id", "time", "username"], slot)
+        .on_conflict_do_nothing(index_elements=[Appointment.timetable_id, Appointment.time])
+        .returning(Appointment.id)
+    )
+    if appointment_id is None:
+        await db.rollback()
+        await raise_booking_error(db, timetable_id, time)
+    await db.commit()
 
-  
 
+# Причина отказа в бронировании (только при отказе, чтобы не тратить запрос на успешную запись)
+async def raise_booking_error(db: AsyncSession, timetable_id: int, time: datetime):
+    db_timetable = await db.scalar(select(Timetable).filter(Timetable.id == timetable_id))
+    if not db_timetable:
+        raise HTTPException(status_code=404, detail="Запись расписания не найдена")
+    if slot_index(db_timetable, time) is None:
+        raise HTTPException(status_code=400, detail="Время записи не доступно")
+    raise HTTPException(status_code=400, detail="Слот для записи уже забронирован")
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import ColumnElement, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.core.config import settings
+from app.models.timetable import Timetable
+
+logger = logging.getLogger(__name__)
+
+# Сколько завершённых задач хранится для запроса прогресса
+MAX_FINISHED_JOBS = 100
+
+
+# Удаление оборвалось на одной из частей. Предыдущие части уже закоммичены (deleted
+# расписаний), повторный запуск с тем же условием удаляет оставшиеся
+class PartialDeleteError(Exception):
+    def __init__(self, deleted: int):
+        super().__init__(f"Удаление прервано, удалено расписаний: {deleted}")
+        self.deleted = deleted
+
+
+# Фоновое удаление расписаний врача или больницы и его прогресс
+class DeleteJob:
+    def __init__(self, scope: str, target_id: int, total: int):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.scope = scope
+        self.target_id = target_id
+        self.total = total
+        self.deleted = 0
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def finish(self, status: str):
+        self.status = status
+        self.finished_at = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "scope": self.scope,
+            "target_id": self.target_id,
+            "total": self.total,
+            "deleted": self.deleted,
+            "elapsed_seconds": round((self.finished_at or time.time()) - self.started_at, 3),
+        }
+
+
+# Задачи удаления в памяти процесса
+delete_jobs: "OrderedDict[str, DeleteJob]" = OrderedDict()
+
+# Фоновые задачи; ссылки хранятся, чтобы задачи не были собраны сборщиком мусора
+_running_deletes = set()
+
+
+def register_job(job: DeleteJob):
+    delete_jobs[job.id] = job
+    finished = [job_id for job_id, j in delete_jobs.items() if j.finished_at is not None]
+    for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+        del delete_jobs[job_id]
+
+
+def get_delete_job(job_id: str) -> DeleteJob:
+    job = delete_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача удаления не найдена")
+    return job
+
+
+# Сколько расписаний подходит под условие, но не больше limit (без полного подсчёта)
+async def count_timetables(db: AsyncSession, condition: ColumnElement, limit: int) -> int:
+    matching = select(Timetable.id).filter(condition).limit(limit).subquery()
+    return await db.scalar(select(func.count()).select_from(matching))
+
+
+# Удалить расписания по условию частями по TIMETABLE_DELETE_CHUNK_SIZE. Каждая часть -
+# один DELETE ... RETURNING в своей транзакции, записи на приём удаляет каскад внешнего ключа.
+# Удаление идемпотентно: если часть не удалась, она откатывается, а PartialDeleteError
+# сообщает, сколько удалено до неё; повторный запуск удаляет оставшееся
+async def delete_timetables_in_chunks(db: AsyncSession, condition: ColumnElement, job: Optional[DeleteJob] = None) -> int:
+    chunk_size = settings.TIMETABLE_DELETE_CHUNK_SIZE
+    deleted = 0
+    while True:
+        chunk = select(Timetable.id).filter(condition).limit(chunk_size)
+        try:
+            ids = (await db.scalars(
+                delete(Timetable)
+                .where(Timetable.id.in_(chunk))
+                .returning(Timetable.id)
+                .execution_options(synchronize_session=False)
+            )).all()
+            await db.commit()
+        except Exception as error:
+            await db.rollback()
+            logger.exception("Удаление расписаний прервано, удалено: %s", deleted)
+            raise PartialDeleteError(deleted) from error
+        deleted += len(ids)
+        if job is not None:
+            job.deleted = deleted
+        if len(ids) < chunk_size:
+            return deleted
+
+
+async def run_delete_job(job: DeleteJob, condition: ColumnElement, session_factory: async_sessionmaker):
+    job.status = "running"
+    try:
+        async with session_factory() as db:
+            await delete_timetables_in_chunks(db, condition, job)
+    except Exception:
+        logger.exception("Удаление расписаний %s прервано, удалено: %s из %s", job.id, job.deleted, job.total)
+        job.finish("failed")
+        raise
+    job.finish("completed")
+
+
+# Удаление расписаний врача или больницы. До TIMETABLE_DELETE_JOB_THRESHOLD записей -
+# сразу (возвращает число удалённых), больше - фоновой задачей (возвращает задачу)
+async def delete_timetables(
+    db: AsyncSession,
+    condition: ColumnElement,
+    scope: str,
+    target_id: int,
+    not_found: str,
+    session_factory: async_sessionmaker,
+):
+    threshold = settings.TIMETABLE_DELETE_JOB_THRESHOLD
+    matching = await count_timetables(db, condition, threshold + 1)
+    if not matching:
+        raise HTTPException(status_code=404, detail=not_found)
+
+    if matching <= threshold:
+        try:
+            return await delete_timetables_in_chunks(db, condition)
+        except PartialDeleteError as error:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Удаление прервано, удалено расписаний: {error.deleted}. Повторите запрос, чтобы удалить остальные",
+            )
+
+    job = DeleteJob(scope, target_id, await count_timetables(db, condition, None))
+    register_job(job)
+    task = asyncio.create_task(run_delete_job(job, condition, session_factory))
+    _running_deletes.add(task)
+    task.add_done_callback(_running_deletes.discard)
+    return job
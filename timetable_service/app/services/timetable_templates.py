@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta
+from typing import List, Tuple
+from fastapi import HTTPException, Request
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.validation import ValidationPipeline
+from app.models.timetable import Timetable
+from app.schemas.timetable import TimetableTemplate
+from app.services.conflicts import EXCLUSION_VIOLATION, MAX_TIMETABLE_DURATION, lock_schedule
+from app.services.slots import to_naive_utc
+from app.services.timetable import check_doctor, check_hospital_room
+
+Interval = Tuple[datetime, datetime]
+
+# Пересечения всех расписаний шаблона одним запросом: для каждого интервала - первое
+# пересекающееся расписание кабинета и врача (каждый подзапрос обслуживается индексом)
+CONFLICTS_QUERY = text("""
+    SELECT c.from_time, c.to_time, r.id AS room_conflict, d.id AS doctor_conflict
+    FROM unnest(CAST(:from_times AS timestamp[]), CAST(:to_times AS timestamp[])) AS c(from_time, to_time)
+    LEFT JOIN LATERAL (
+        SELECT t.id FROM timetables t
+        WHERE t.hospital_id = :hospital_id AND t.room = :room
+            AND t.from_time < c.to_time AND t.to_time > c.from_time
+            AND t.from_time > c.from_time - CAST(:max_duration AS interval)
+            AND tsrange(t.from_time, t.to_time) && tsrange(c.from_time, c.to_time)
+        ORDER BY t.from_time LIMIT 1
+    ) r ON true
+    LEFT JOIN LATERAL (
+        SELECT t.id FROM timetables t
+        WHERE t.doctor_id = :doctor_id
+            AND t.from_time < c.to_time AND t.to_time > c.from_time
+            AND t.from_time > c.from_time - CAST(:max_duration AS interval)
+            AND tsrange(t.from_time, t.to_time) && tsrange(c.from_time, c.to_time)
+        ORDER BY t.from_time LIMIT 1
+    ) d ON true
+    WHERE r.id IS NOT NULL OR d.id IS NOT NULL
+    ORDER BY c.from_time
+""")
+
+
+def changed_during_creation(created: int, total: int) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"Расписание изменилось во время создания по шаблону, создано {created} из {total}",
+    )
+
+
+# Развернуть шаблон в интервалы (наивное UTC, как в БД) с теми же правилами, что и при создании
+def expand_template(template: TimetableTemplate) -> List[Interval]:
+    if template.date_from > template.date_to:
+        raise HTTPException(status_code=400, detail="Недействительный период шаблона")
+    days = (template.date_to - template.date_from).days + 1
+    if days > settings.TIMETABLE_TEMPLATE_MAX_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Период шаблона не должен превышать {settings.TIMETABLE_TEMPLATE_MAX_DAYS} дней",
+        )
+
+    intervals = []
+    for offset in range(days):
+        day = template.date_from + timedelta(days=offset)
+        if day.isoweekday() in template.weekdays:
+            intervals.append((
+                to_naive_utc(datetime.combine(day, template.start_time)),
+                to_naive_utc(datetime.combine(day, template.end_time)),
+            ))
+    if not intervals:
+        raise HTTPException(status_code=400, detail="В указанном периоде нет выбранных дней недели")
+
+    from_time, to_time = intervals[0]
+    if from_time >= to_time:
+        raise HTTPException(status_code=400, detail="Недействительный диапазон времени")
+    time_difference = (to_time - from_time).total_seconds() / 60
+    if time_difference > 720 or time_difference % 30 != 0 or from_time.second or to_time.second:
+        raise HTTPException(status_code=400, detail="Недействительный диапазон времени или продолжительность")
+    return intervals
+
+
+async def find_template_conflicts(db: AsyncSession, template: TimetableTemplate, intervals: List[Interval]) -> List[dict]:
+    rows = await db.execute(CONFLICTS_QUERY, {
+        "from_times": [from_time for from_time, _ in intervals],
+        "to_times": [to_time for _, to_time in intervals],
+        "hospital_id": template.hospital_id,
+        "room": template.room,
+        "doctor_id": template.doctor_id,
+        "max_duration": MAX_TIMETABLE_DURATION,
+    })
+    conflicts = []
+    for row in rows:
+        for kind, timetable_id in (("room", row.room_conflict), ("doctor", row.doctor_conflict)):
+            if timetable_id is not None:
+                conflicts.append({
+                    "from_time": row.from_time,
+                    "to_time": row.to_time,
+                    "kind": kind,
+                    "timetable_id": timetable_id,
+                })
+    return conflicts
+
+
+# Создание расписаний по шаблону. Больница, кабинет и врач проверяются один раз,
+# пересечения - одним запросом на все даты. Записи вставляются пачками по
+# TIMETABLE_TEMPLATE_BATCH_SIZE, каждая в своей транзакции под блокировкой кабинета
+# и врача с повторной проверкой пачки. dry_run только возвращает конфликты.
+async def create_timetables_from_template(db: AsyncSession, template: TimetableTemplate, request: Request) -> dict:
+    intervals = expand_template(template)
+
+    pipeline = ValidationPipeline()
+    pipeline.add("hospital", lambda: check_hospital_room(template.hospital_id, template.room, request))
+    pipeline.add("doctor", lambda: check_doctor(template.doctor_id, request))
+    await pipeline.run()
+
+    if not template.dry_run:
+        await lock_schedule(db, template.hospital_id, template.room, template.doctor_id)
+    conflicts = await find_template_conflicts(db, template, intervals)
+    result = {"dry_run": template.dry_run, "total": len(intervals), "created": 0, "conflicts": conflicts}
+    if template.dry_run:
+        await db.rollback()
+        return result
+    if conflicts:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Шаблон пересекается с существующими расписаниями ({len(conflicts)}). Проверьте конфликты в режиме dry_run",
+        )
+
+    batch_size = settings.TIMETABLE_TEMPLATE_BATCH_SIZE
+    for start in range(0, len(intervals), batch_size):
+        batch = intervals[start:start + batch_size]
+        if start:
+            await lock_schedule(db, template.hospital_id, template.room, template.doctor_id)
+            if await find_template_conflicts(db, template, batch):
+                await db.rollback()
+                raise changed_during_creation(result["created"], len(intervals))
+        try:
+            await db.execute(insert(Timetable), [
+                {
+                    "hospital_id": template.hospital_id,
+                    "doctor_id": template.doctor_id,
+                    "room": template.room,
+                    "from_time": from_time,
+                    "to_time": to_time,
+                }
+                for from_time, to_time in batch
+            ])
+            await db.commit()
+        except IntegrityError as e:
+            if getattr(e.orig, "sqlstate", None) != EXCLUSION_VIOLATION:
+                raise
+            await db.rollback()
+            raise changed_during_creation(result["created"], len(intervals))
+        result["created"] += len(batch)
+    return result
@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+# Тесты импортируют пакет app этого сервиса; настройки читаются при импорте
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("DATABASE_URL", os.getenv("TEST_DATABASE_URL") or "postgresql://localhost/test")
+os.environ.setdefault("ACCOUNT_SERVICE_URL", "http://account")
+os.environ.setdefault("HOSPITAL_SERVICE_URL", "http://hospital")
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.db.migrations import run_migrations
+from app.models.appointment import Appointment
+from app.models.timetable import Timetable
+from app.services.timetable_deletion import PartialDeleteError, delete_timetables, delete_timetables_in_chunks
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="нужен TEST_DATABASE_URL")
+
+DOCTOR_ID = 7
+TIMETABLES = 35
+CHUNK_SIZE = 10
+
+
+async def execute(url, *statements: str):
+    engine = create_async_engine(url, isolation_level="AUTOCOMMIT")
+    try:
+        async with engine.connect() as conn:
+            for statement in statements:
+                await conn.execute(text(statement))
+    finally:
+        await engine.dispose()
+
+
+@asynccontextmanager
+async def open_sessions(url):
+    engine = create_async_engine(url)
+    try:
+        yield async_sessionmaker(bind=engine, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+
+
+# Временная БД с миграциями сервиса и TIMETABLES расписаниями врача DOCTOR_ID
+@pytest.fixture
+def database_url(monkeypatch):
+    monkeypatch.setattr(settings, "TIMETABLE_DELETE_CHUNK_SIZE", CHUNK_SIZE)
+    admin_url = make_url(TEST_DATABASE_URL).set(drivername="postgresql+asyncpg")
+    name = f"deletion_test_{uuid.uuid4().hex[:12]}"
+    asyncio.run(execute(admin_url, f"CREATE DATABASE {name}"))
+    url = admin_url.set(database=name)
+
+    async def prepare():
+        engine = create_async_engine(url)
+        await run_migrations(engine)
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "INSERT INTO timetables (hospital_id, doctor_id, room, from_time, to_time) "
+                f"SELECT 1, {DOCTOR_ID}, 'r', timestamp '2100-01-01' + g * interval '1 hour', "
+                "timestamp '2100-01-01' + g * interval '1 hour' + interval '30 minutes' "
+                f"FROM generate_series(1, {TIMETABLES}) g"
+            ))
+            await conn.execute(text("INSERT INTO appointments (timetable_id, username, time) SELECT id, 'u', from_time FROM timetables"))
+        await engine.dispose()
+
+    asyncio.run(prepare())
+    yield url
+    asyncio.run(execute(admin_url, f"DROP DATABASE {name} WITH (FORCE)"))
+
+
+# Часть удаления с номером number падает, как при обрыве соединения
+def fail_on_chunk(db, number: int):
+    calls = 0
+    scalars = db.scalars
+
+    async def failing_scalars(statement, *args, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == number:
+            raise ConnectionResetError("соединение с БД разорвано")
+        return await scalars(statement, *args, **kwargs)
+
+    db.scalars = failing_scalars
+
+
+async def count_rows(db) -> tuple:
+    timetables = await db.scalar(select(func.count()).select_from(Timetable))
+    appointments = await db.scalar(select(func.count()).select_from(Appointment))
+    return timetables, appointments
+
+
+def test_failed_chunk_reports_progress_and_rerun_finishes(database_url):
+    async def scenario():
+        async with open_sessions(database_url) as session_factory, session_factory() as db:
+            fail_on_chunk(db, 3)
+            with pytest.raises(PartialDeleteError) as error:
+                await delete_timetables_in_chunks(db, Timetable.doctor_id == DOCTOR_ID)
+            assert error.value.deleted == 2 * CHUNK_SIZE
+
+        async with open_sessions(database_url) as session_factory, session_factory() as db:
+            left = TIMETABLES - 2 * CHUNK_SIZE
+            assert await count_rows(db) == (left, left)
+            assert await delete_timetables_in_chunks(db, Timetable.doctor_id == DOCTOR_ID) == left
+            assert await count_rows(db) == (0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_failed_synchronous_delete_returns_progress(database_url):
+    async def scenario():
+        async with open_sessions(database_url) as session_factory, session_factory() as db:
+            fail_on_chunk(db, 2)
+            with pytest.raises(HTTPException) as error:
+                await delete_timetables(
+                    db, Timetable.doctor_id == DOCTOR_ID, "doctor", DOCTOR_ID, "не найдено", session_factory,
+                )
+            assert error.value.status_code == 500
+            assert f"удалено расписаний: {CHUNK_SIZE}" in error.value.detail
+
+    asyncio.run(scenario())